@@ -0,0 +1,169 @@
+import threading
+import time
+
+from perf import timed
+
+
+class Autosave:
+    """Writes task changes to storage from a background thread.
+
+    mark() only records what changed and returns at once, so slow disks
+    never stall the Tk event loop.  A burst of changes is coalesced into a
+    single storage.save() once nothing has changed for ``delay`` seconds,
+    or ``max_delay`` seconds after the first unsaved change at the latest.
+    Only the last state of each task is written, copied under the
+    collection lock so the worker never reads a half-applied edit.  The
+    storages write atomically (temp file + rename, or an fsynced journal
+    append), and a failed write is retried with the next one.
+
+    flush() writes whatever is pending right away and waits for it; stop()
+    does the same before ending the thread, for window close.
+    metrics() reports pending changes, write count, the duration of the
+    last save and the number of bytes written.
+    """
+
+    def __init__(self, tasks, storage, delay=0.5, max_delay=5.0):
+        self.tasks = tasks
+        self.storage = storage
+        self.delay = delay
+        self.max_delay = max_delay
+        self.cond = threading.Condition()
+        self.changes = {}  # task id -> (op, task), last change wins
+        self.full = False
+        self.first_mark = None
+        self.last_mark = None
+        self.pending = 0
+        self.saving = False
+        self.flush_requested = False
+        self.stopped = False
+        self.thread = None
+        self.writes = 0
+        self.last_duration = 0.0
+        self.bytes_written = 0
+        self.last_error = None
+
+    def start(self):
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def mark(self, changes=None):
+        """Note changed tasks, as ``[(op, task)]``; None asks for a full snapshot"""
+        with self.cond:
+            if changes is None:
+                self.full = True
+                self.changes = {}
+            elif not self.full:
+                for op, task in changes:
+                    self.changes[task["id"]] = (op, task)
+            now = time.monotonic()
+            if self.first_mark is None:
+                self.first_mark = now
+            self.last_mark = now
+            self.pending += 1
+            self.cond.notify_all()
+
+    @property
+    def dirty(self):
+        return self.first_mark is not None or self.saving
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.stopped:
+                    if self.first_mark is None:
+                        self.cond.wait()
+                        continue
+                    if self.flush_requested:
+                        break
+                    due = min(self.last_mark + self.delay, self.first_mark + self.max_delay)
+                    delay = due - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                if self.first_mark is None:
+                    return
+                work = self._take()
+            self._write(*work)
+            if self.stopped and self.last_error is not None:
+                return  # stop() makes one more attempt itself
+
+    def _take(self):
+        # Called with the condition held
+        work = (self.changes, self.full)
+        self.changes, self.full = {}, False
+        self.first_mark = self.last_mark = None
+        self.pending = 0
+        self.flush_requested = False
+        self.saving = True
+        return work
+
+    @timed("save")
+    def _write(self, changes, full):
+        start = time.perf_counter()
+        try:
+            if full:
+                written = self.storage.save(self.tasks.snapshot(), None)
+            else:
+                with self.tasks.lock:
+                    batch = [(op, task.copy()) for op, task in changes.values()]
+                # The full list is only needed if the journal decides to compact
+                written = self.storage.save(self.tasks.snapshot, batch)
+            self.writes += 1
+            self.bytes_written += written or 0
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            with self.cond:
+                # Put the changes back (newer ones win) so the next write retries them
+                if full:
+                    self.full = True
+                    self.changes = {}
+                elif not self.full:
+                    for task_id, change in changes.items():
+                        self.changes.setdefault(task_id, change)
+                now = time.monotonic()
+                self.first_mark = self.first_mark or now
+                self.last_mark = now
+        finally:
+            self.last_duration = time.perf_counter() - start
+            with self.cond:
+                self.saving = False
+                self.cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Write pending changes now; returns False if that didn't finish within timeout"""
+        if self.thread is None or not self.thread.is_alive():
+            with self.cond:
+                if self.first_mark is None:
+                    return True
+                work = self._take()
+            self._write(*work)
+            return self.last_error is None
+        with self.cond:
+            self.last_error = None
+            self.flush_requested = True
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: not self.dirty or self.last_error is not None, timeout)
+            return not self.dirty
+
+    def stop(self, timeout=10.0):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        # Anything marked after the thread exited (or if it never ran)
+        self.flush()
+
+    def metrics(self):
+        return {
+            "pending": self.pending,
+            "dirty": self.dirty,
+            "writes": self.writes,
+            "last_save_seconds": self.last_duration,
+            "bytes_written": self.bytes_written,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
@@ -0,0 +1,741 @@
+import argparse
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from autosave import Autosave
+from dependency_graph import CycleError, DependencyGraph
+from import_export import export_tasks
+from recurrence import FREQUENCIES, make_rule, next_occurrence, upcoming
+from reminders import ReminderScheduler
+from search_index import SearchIndex, searchable_text
+from sorted_views import SORT_KEYS, SortedViews
+from storage import JsonStorage, JournalStorage, SqliteStorage, batched, new_task_id
+from sync import SyncClient, SyncServer
+from task_model import Task, TaskCollection
+from task_store import TaskStore
+from workspaces import Workspace
+
+SIZES = [1000, 10000, 100000]
+CATEGORIES = ["Work", "Personal", "Shopping", "Health", "Other"]
+PRIORITIES = ["High", "Medium", "Low"]
+WORDS = ["review", "call", "buy", "write", "plan", "fix", "email", "book", "clean", "read",
+         "report", "groceries", "dentist", "budget", "meeting", "invoice", "gym", "draft"]
+
+# Due date distributions: (share of tasks with a due date, first day, last day) relative to today
+DUE_DATES = {
+    "spread": (0.6, -30, 60),
+    "none": (0.0, 0, 0),
+    "overdue": (0.9, -60, -1),
+    "soon": (0.9, 0, 7),
+}
+# The task mix every benchmark generates; set from the command line
+PROFILE = {"tags": 1.0, "notes": 0.0, "due": "spread"}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark that can't run here (e.g. no display for Tk)"""
+
+
+def make_task(rng, tags=1.0, notes=0.0, due="spread"):
+    """A random task with on average ``tags`` tags, notes on a ``notes`` share of tasks and DUE_DATES[due]"""
+    today = datetime.now().date()
+    share, first, last = DUE_DATES[due]
+    due_date = "No due date"
+    if rng.random() < share:
+        due_date = (today + timedelta(days=rng.randint(first, last))).strftime("%Y-%m-%d")
+    task = {
+        "id": new_task_id(),
+        "task": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))),
+        "completed": rng.random() < 0.3,
+        "category": rng.choice(CATEGORIES),
+        "priority": rng.choice(PRIORITIES),
+        "due_date": due_date,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "notes": "",
+        "tags": rng.sample(WORDS, min(len(WORDS), rng.randint(0, round(2 * tags)))),
+        "dependencies": []
+    }
+    if notes and rng.random() < notes:
+        task["notes"] = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))
+    return task
+
+
+def make_tasks(count, seed=0, **profile):
+    rng = random.Random(seed)
+    profile = {**PROFILE, **profile}
+    return [make_task(rng, **profile) for _ in range(count)]
+
+
+def timeit(func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_storage(size, repeat=20):
+    """Time one single-task edit persisted by each storage backend"""
+    tasks = make_tasks(size)
+    results = {}
+    workdir = tempfile.mkdtemp()
+    try:
+        for name, storage in (("full dump", JsonStorage(os.path.join(workdir, "full.json"))),
+                              ("journal", JournalStorage(os.path.join(workdir, "journal.json"))),
+                              ("sqlite", SqliteStorage(os.path.join(workdir, "tasks.db")))):
+            storage.save(tasks)
+            task = tasks[size // 2]
+
+            def edit():
+                task["completed"] = not task["completed"]
+                storage.save(tasks, [("put", task)])
+
+            results[name] = timeit(edit, repeat)
+            start = time.perf_counter()
+            storage.load()
+            results[f"{name} load"] = time.perf_counter() - start
+            storage.close()
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+
+def bench_autosave(size, edits=200):
+    """UI-thread time per edit: saving synchronously vs handing the change to the autosave thread"""
+    workdir = tempfile.mkdtemp()
+    try:
+        collection = TaskCollection(Task(task) for task in make_tasks(size))
+        storage = JournalStorage(os.path.join(workdir, "tasks.json"))
+        storage.save(collection)
+
+        def edit(index, save):
+            task = collection[index % len(collection)]
+            collection.update(task["id"], completed=not task["completed"])
+            save([("put", task)])
+
+        start = time.perf_counter()
+        for index in range(edits):
+            edit(index, lambda changes: storage.save(collection, changes))
+        sync = (time.perf_counter() - start) / edits
+
+        autosave = Autosave(collection, storage, delay=0.05)
+        autosave.start()
+        start = time.perf_counter()
+        for index in range(edits):
+            edit(index, autosave.mark)
+        background = (time.perf_counter() - start) / edits
+        autosave.stop()
+        storage.close()
+        return {"sync": sync, "autosave": background, "writes": autosave.writes}
+    finally:
+        shutil.rmtree(workdir)
+
+
+def bench_search(size, queries=("rev", "dentist", "gro", "budget meeting")):
+    """Time index lookups against the linear scan the search box used to do"""
+    tasks = make_tasks(size)
+    start = time.perf_counter()
+    index = SearchIndex()
+    index.rebuild(tasks)
+    results = {"build": time.perf_counter() - start}
+    texts = [searchable_text(task) for task in tasks]
+    results["index"] = sum(timeit(lambda: index.search(q)) for q in queries) / len(queries)
+    results["scan"] = sum(timeit(lambda: [t for t in texts if q in t], 5) for q in queries) / len(queries)
+    return results
+
+
+def bench_export(size, names=("tasks.csv", "tasks.jsonl", "tasks.tcol", "tasks.csv.gz", "tasks.tcol.gz")):
+    """Export throughput in rows/sec for each format"""
+    tasks = make_tasks(size)
+    results = {}
+    workdir = tempfile.mkdtemp()
+    try:
+        for name in names:
+            path = os.path.join(workdir, name)
+            start = time.perf_counter()
+            count = export_tasks(tasks, path)
+            results[f"{name} rows/s"] = round(count / (time.perf_counter() - start))
+            results[f"{name} KiB"] = os.path.getsize(path) // 1024
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+
+def bench_import(size):
+    """CSV import into an empty list, and again into the same tasks where every row is a duplicate"""
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, "tasks.csv")
+        export_tasks(make_tasks(size), path)
+        store = TaskStore(JournalStorage(os.path.join(workdir, "tasks.json")))
+        start = time.perf_counter()
+        imported, _ = store.import_csv(path)
+        results = {"import": time.perf_counter() - start, "imported": imported}
+        start = time.perf_counter()
+        _, skipped = store.import_csv(path)
+        results["reimport"] = time.perf_counter() - start
+        results["skipped"] = skipped
+        store.close()
+        return results
+    finally:
+        shutil.rmtree(workdir)
+
+
+def bench_reminders(size, repeat=200):
+    """Scheduling every reminder (on load) and rescheduling one task after an edit"""
+    collection = TaskCollection(Task(task) for task in make_tasks(size))
+    start = time.perf_counter()
+    scheduler = ReminderScheduler(collection, lambda task_id, kind: None)
+    build = time.perf_counter() - start
+    rng = random.Random(1)
+    today = datetime.now().date()
+
+    def edit():
+        task = collection[rng.randrange(len(collection))]
+        collection.update(task["id"], due_date=(today + timedelta(days=rng.randint(1, 30))).isoformat())
+
+    return {"schedule all": build, "reschedule": timeit(edit, repeat), "queued": len(scheduler.heap)}
+
+
+def bench_recurrence(size, repeat=200):
+    """Repeating tasks: advancing one on completion, and listing the next 30 days of occurrences"""
+    rng = random.Random(1)
+    today = datetime.now().date()
+    tasks = [Task(task) for task in make_tasks(size)]
+    for task in tasks:
+        start = today - timedelta(days=rng.randint(0, 3650))
+        task["recurrence"] = make_rule(rng.choice(FREQUENCIES), start.isoformat(), rng.randint(1, 3))
+        task["due_date"] = next_occurrence(task["recurrence"], (today - timedelta(days=1)).isoformat())
+
+    def advance():
+        task = tasks[rng.randrange(size)]
+        task["due_date"] = next_occurrence(task["recurrence"], task["due_date"])
+
+    window = today + timedelta(days=30)
+    start = time.perf_counter()
+    count = sum(1 for _ in upcoming(tasks, today, window))
+    return {"advance": timeit(advance, repeat), "30 days": time.perf_counter() - start, "occurrences": count}
+
+
+def bench_sort(size, repeat=20):
+    """Switching sort mode: a fresh sort of every task vs the maintained views, plus one edit"""
+    collection = TaskCollection(Task(task) for task in make_tasks(size))
+    views = SortedViews(collection)
+    modes = list(SORT_KEYS)
+    for mode in modes:
+        views.ids(mode)
+    rng = random.Random(1)
+
+    def resort():
+        for mode in modes:
+            [task["id"] for task in sorted(collection, key=SORT_KEYS[mode])]
+
+    def switch():
+        for mode in modes:
+            list(views.ids(mode))
+
+    def edit():
+        task = collection[rng.randrange(len(collection))]
+        collection.update(task["id"], priority=rng.choice(PRIORITIES))
+
+    return {"resort": timeit(resort, repeat) / len(modes), "views": timeit(switch, repeat) / len(modes),
+            "edit": timeit(edit, repeat)}
+
+
+def make_dependent_tasks(size, seed=0, span=20):
+    """Tasks in dense chains: each depends on up to three of the twenty created before it"""
+    tasks = [Task(task) for task in make_tasks(size, seed)]
+    rng = random.Random(seed)
+    for index, task in enumerate(tasks):
+        earlier = tasks[max(0, index - span):index]
+        task["dependencies"] = [dep["id"] for dep in rng.sample(earlier, min(len(earlier), rng.randint(1, 3)))]
+    rng.shuffle(tasks)
+    return tasks
+
+
+def bench_graph(size, repeat=200):
+    """Dependency graph: build, completing a task, and adding an edge (cycle check plus reordering)"""
+    tasks = make_dependent_tasks(size)
+    collection = TaskCollection()
+    graph = DependencyGraph(collection)
+    start = time.perf_counter()
+    collection.reset(tasks)
+    build = time.perf_counter() - start
+    rng = random.Random(1)
+
+    def complete():
+        task = collection[rng.randrange(len(collection))]
+        collection.update(task["id"], completed=not task["completed"])
+
+    def link():
+        task = collection[rng.randrange(len(collection))]
+        dep = collection[rng.randrange(len(collection))]["id"]
+        try:
+            graph.check(task["id"], [dep])
+        except CycleError:
+            return
+        collection.update(task["id"], dependencies=task["dependencies"] + [dep])
+
+    return {"build": build, "complete": timeit(complete, repeat), "link": timeit(link, repeat),
+            "ready": len(graph.ready), "blocked": len(graph.blocked)}
+
+
+def bench_memory(size):
+    """Resident size of the task list as plain dicts vs Task objects, plus a field-access scan"""
+    results = {}
+    for name, convert in (("dict", dict), ("Task", Task)):
+        tasks = make_tasks(size)
+        tracemalloc.start()
+        # Tasks decoded from JSON don't share strings, so copy every value like json.load would
+        converted = [convert({key: _unshared(value) for key, value in task.items()}) for task in tasks]
+        del tasks
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        scan = timeit(lambda: sum(1 for task in converted if not task["completed"] and task["priority"] == "High"), 5)
+        results[f"{name} B/task"] = round(current / size)
+        results[f"{name} scan"] = scan
+    return results
+
+
+def _unshared(value):
+    if isinstance(value, str):
+        return (value + ".")[:-1]
+    if isinstance(value, list):
+        return [_unshared(item) for item in value]
+    return value
+
+
+def bench_store(size, repeat=20):
+    """The app's operations through the headless TaskStore (no display needed)"""
+    workdir = tempfile.mkdtemp()
+    try:
+        storage = JournalStorage(os.path.join(workdir, "tasks.json"))
+        storage.save(make_tasks(size))
+        store = TaskStore(storage)
+        start = time.perf_counter()
+        store.load()
+        load = time.perf_counter() - start
+        ids = [task["id"] for task in store.tasks]
+        rng = random.Random(0)
+        result = {
+            "load": load,
+            "add": timeit(lambda: store.add("benchmark task", "Work", "High"), repeat),
+            "complete": timeit(lambda: store.complete(rng.choice(ids)), repeat),
+            "edit": timeit(lambda: store.edit(rng.choice(ids), priority=rng.choice(PRIORITIES)), repeat),
+            "query": timeit(lambda: store.query("active", "", "date"), repeat),
+            "search": timeit(lambda: store.query("all", "budget", "priority"), repeat),
+            "stats": timeit(lambda: (store.stats.overdue(), store.stats.due_today(),
+                                     [store.stats.priority_progress(p) for p in PRIORITIES]), repeat),
+        }
+        start = time.perf_counter()
+        store.complete_many(ids[:size // 10])
+        result["batch"] = time.perf_counter() - start
+        store.close()
+        return result
+    finally:
+        shutil.rmtree(workdir)
+
+
+def bench_undo(size, repeat=20):
+    """Undo and redo of single edits and of a ``size`` task import, from the operation log"""
+    class NullStorage:
+        def save(self, tasks, changes=None):
+            pass
+
+        def close(self):
+            pass
+
+    store = TaskStore(NullStorage())
+    store.tasks.reset(Task.from_dict(task) for task in make_tasks(size))
+    ids = [task["id"] for task in store.tasks]
+    rng = random.Random(0)
+    for _ in range(repeat):
+        store.edit(rng.choice(ids), priority=rng.choice(PRIORITIES))
+    results = {"undo edit": timeit(store.undo, repeat), "redo edit": timeit(store.redo, repeat)}
+    importer = object()
+    start = time.perf_counter()
+    for batch in batched([Task.from_dict(task) for task in make_tasks(size, seed=1)], 5000):
+        store.add_imported(batch, importer)
+    results["import"] = time.perf_counter() - start
+    results["logged ops"] = store.history.ops
+    start = time.perf_counter()
+    store.undo()
+    results["undo import"] = time.perf_counter() - start
+    start = time.perf_counter()
+    store.redo()
+    results["redo import"] = time.perf_counter() - start
+    return results
+
+
+def bench_startup(size):
+    """Importing the app and the CLI, and the tasks.json load: first screenful and everything streamed vs json.load"""
+    results = {}
+    for name, module in (("import", "todo_app"), ("cli import", "cli")):
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        results[name] = float(output.stdout) if output.returncode == 0 else None
+    workdir = tempfile.mkdtemp()
+    try:
+        storage = JournalStorage(os.path.join(workdir, "tasks.json"))
+        storage.save(make_tasks(size))
+        store = TaskStore(storage)
+        start = time.perf_counter()
+        store.load()
+        results["blocking load"] = time.perf_counter() - start
+
+        store = TaskStore(storage)
+        start = time.perf_counter()
+        loader = store.loader()
+        loader.start()
+        message = loader.queue.get()
+        store.add_loaded(message[1])
+        results["first screen"] = time.perf_counter() - start
+        store.load_all(loader)
+        results["streamed load"] = time.perf_counter() - start
+        results["loaded"] = len(store.tasks)
+        store.close()
+        return results
+    finally:
+        shutil.rmtree(workdir)
+
+
+def bench_workspaces(size, lists=4):
+    """Switching between lists of ``size`` tasks, with a memory cap that keeps two of them loaded"""
+    workdir = tempfile.mkdtemp()
+    try:
+        names = [f"list{i}.json" for i in range(lists)]
+        for i, name in enumerate(names):
+            JournalStorage(os.path.join(workdir, name)).save(make_tasks(size, seed=i))
+        workspace = Workspace(workdir, memory_cap=2 * size * Workspace.TASK_BYTES)
+        start = time.perf_counter()
+        workspace.refresh_summaries()
+        workspace.summary_thread.join()
+        results = {"summaries": time.perf_counter() - start}
+
+        def switch(name):
+            start = time.perf_counter()
+            workspace.open(name)
+            return time.perf_counter() - start
+
+        results["uncached switch"] = max(switch(name) for name in names)
+        # The last two lists are still loaded; the others were evicted on the way
+        results["cached switch"] = max(switch(names[-2]), switch(names[-1]))
+        results["evicted switch"] = switch(names[0])
+        results["loaded lists"] = len(workspace.cache)
+        results["estimate KB"] = workspace.memory_estimate() // 1024
+        workspace.close()
+        return results
+    finally:
+        shutil.rmtree(workdir)
+
+
+def bench_sync(size, changes=100):
+    """Delta sync of a ``size`` task list between two machines through the local sync server"""
+    workdir = tempfile.mkdtemp()
+    server = SyncServer(port=0).start()
+    try:
+        stores = []
+        for name, tasks in (("a.json", make_tasks(size)), ("b.json", [])):
+            storage = JournalStorage(os.path.join(workdir, name))
+            storage.save(tasks)
+            store = TaskStore(storage)
+            store.load()
+            stores.append(store)
+        a, b = stores
+        sync_a, sync_b = SyncClient(a, server.url), SyncClient(b, server.url)
+
+        def timed_sync(client):
+            start = time.perf_counter()
+            result = client.sync()
+            if result[0] == "error":
+                raise RuntimeError(result[1])
+            return time.perf_counter() - start, result[1]
+
+        results = {}
+        results["first push"], stats = timed_sync(sync_a)
+        results["first push KB"] = stats["bytes sent"] // 1024
+        results["first pull"], _ = timed_sync(sync_b)
+        rng = random.Random(0)
+        ids = [task["id"] for task in a.tasks]
+        for task_id in rng.sample(ids, changes):
+            a.edit(task_id, priority=rng.choice(PRIORITIES))
+        # The same tasks edited on the other machine too, in a different field
+        for task_id in rng.sample(ids, changes // 10):
+            b.edit(task_id, notes="edited elsewhere")
+        results["delta push"], stats = timed_sync(sync_a)
+        results["delta bytes"] = stats["bytes sent"]
+        results["delta pull"], stats = timed_sync(sync_b)
+        results["delta pulled"] = stats["received"]
+        results["pull back"], _ = timed_sync(sync_a)
+        results["converged"] = str(sorted(map(dict, a.tasks), key=lambda task: task["id"]) ==
+                                   sorted(map(dict, b.tasks), key=lambda task: task["id"]))
+        results["idle sync"], _ = timed_sync(sync_a)
+        for client in (sync_a, sync_b):
+            client.close()
+        for store in stores:
+            store.close()
+        return results
+    finally:
+        server.stop()
+        shutil.rmtree(workdir)
+
+
+def bench_ui(size, repeat=20):
+    """Drive TodoApp headlessly (withdrawn root) and time a single-task mutation vs a full rebuild"""
+    try:
+        import tkinter as tk
+        from todo_app import TodoApp
+    except ImportError as e:
+        raise SkipBenchmark(e)
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SkipBenchmark(e)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        storage = JournalStorage(os.path.join(workdir, "tasks.json"))
+        storage.save(make_tasks(size))
+        root.withdraw()
+        start = time.perf_counter()
+        app = TodoApp(root, storage)
+        while not app.task_listbox.items and app.loader is not None:
+            root.update()
+        first_screen = time.perf_counter() - start
+        while app.loader is not None:
+            root.update()
+        root.update()
+        loaded = time.perf_counter() - start
+
+        def complete():
+            app.task_listbox.select(0)
+            app.complete_task()
+            root.update()
+
+        def rebuild():
+            app.update_task_list()
+            app.update_stats()
+            root.update()
+
+        return {"first screen": first_screen, "loaded": loaded,
+                "complete": timeit(complete, repeat), "rebuild": timeit(rebuild, repeat)}
+    finally:
+        root.destroy()
+        shutil.rmtree(workdir)
+
+
+def stress_collection(size=10000, writers=3, readers=4, seconds=3.0):
+    """Hammer a TaskCollection from several threads and check every snapshot is consistent.
+
+    Writers always set "task" and "notes" to the same value in one update,
+    so a snapshot that sees them differ has caught a half-applied write.
+    """
+    tasks = make_tasks(size)
+    for task in tasks:
+        task["notes"] = task["task"]
+    collection = TaskCollection(tasks)
+    deadline = time.perf_counter() + seconds
+    errors = []
+    counts = {"writes": 0, "snapshots": 0}
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            op = rng.random()
+            if op < 0.6:
+                text = f"edit {rng.random()}"
+                with collection.lock:
+                    task = collection[rng.randrange(len(collection))]
+                    collection.update(task["id"], task=text, notes=text, completed=not task["completed"])
+            elif op < 0.8:
+                task = make_task(rng)
+                task["notes"] = task["task"]
+                collection.add(task)
+            else:
+                with collection.lock:
+                    if len(collection) > size // 2:
+                        collection.remove(collection[rng.randrange(len(collection))]["id"])
+            counts["writes"] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            snapshot = collection.snapshot()
+            ids = set()
+            for task in snapshot:
+                if task["task"] != task["notes"]:
+                    errors.append(f"torn write on {task['id']}")
+                ids.add(task["id"])
+            if len(ids) != len(snapshot):
+                errors.append("duplicate ids in snapshot")
+            counts["snapshots"] += 1
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts, errors
+
+
+BENCHMARKS = {
+    "storage": bench_storage,
+    "autosave": bench_autosave,
+    "search": bench_search,
+    "export": bench_export,
+    "import": bench_import,
+    "sort": bench_sort,
+    "graph": bench_graph,
+    "memory": bench_memory,
+    "reminders": bench_reminders,
+    "recurrence": bench_recurrence,
+    "store": bench_store,
+    "undo": bench_undo,
+    "startup": bench_startup,
+    "workspaces": bench_workspaces,
+    "sync": bench_sync,
+    "ui": bench_ui,
+}
+
+
+def run_benchmark(name, size, profile=None, memory=False):
+    """Run one benchmark; optionally under cProfile (stats saved to the ``profile`` directory) and tracemalloc"""
+    func = BENCHMARKS[name]
+    # bench_memory does its own tracing
+    memory = memory and name != "memory"
+    if memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler:
+            profiler.enable()
+        result = func(size)
+    finally:
+        if profiler:
+            profiler.disable()
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    if memory:
+        result["peak KiB"] = peak // 1024
+    if profiler:
+        os.makedirs(profile, exist_ok=True)
+        path = os.path.join(profile, f"{name}-{size}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(12)
+        result["profile"] = path
+        print(out.getvalue())
+    return result
+
+
+def format_value(value):
+    # Floats are durations in seconds, everything else is a count
+    if isinstance(value, float):
+        return f"{value * 1000:.3f}ms"
+    return str(value)
+
+
+def print_table(name, rows):
+    keys = [key for key in next(iter(rows.values())) if key != "profile"]
+    widths = [max(len(key), 12) for key in keys]
+    print(f"\n{name}")
+    print(f"{'tasks':>8} " + " ".join(f"{key:>{width}}" for key, width in zip(keys, widths)))
+    for size, result in rows.items():
+        print(f"{size:>8} " + " ".join(f"{format_value(result.get(key)):>{width}}" for key, width in zip(keys, widths)))
+
+
+def compare(results, baseline, threshold):
+    """Timings that got more than ``threshold`` (a fraction) slower than in the baseline results"""
+    regressions = []
+    for name, rows in results.items():
+        for size, result in rows.items():
+            old = baseline.get(name, {}).get(str(size), {})
+            for key, value in result.items():
+                before = old.get(key)
+                if isinstance(value, float) and isinstance(before, float) and before > 0 and value > before * (1 + threshold):
+                    regressions.append(f"{name} {key} at {size} tasks: {before * 1000:.3f}ms -> {value * 1000:.3f}ms "
+                                       f"(+{(value / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time the task manager's hot paths on synthetic task lists.")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help=f"which benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="task list sizes, e.g. 1000 10000 1000000")
+    parser.add_argument("--tags", type=float, default=PROFILE["tags"], help="average number of tags per task")
+    parser.add_argument("--notes", type=float, default=PROFILE["notes"], help="share of tasks with notes (0-1)")
+    parser.add_argument("--due", choices=list(DUE_DATES), default=PROFILE["due"], help="due date distribution")
+    parser.add_argument("--json", metavar="FILE", help="write the results (and run details) to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="report timings slower than in an earlier --json FILE")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression (default 0.2)")
+    parser.add_argument("--profile", metavar="DIR", help="run under cProfile and save a .prof file per run to DIR")
+    parser.add_argument("--memory", action="store_true", help="record the peak traced memory of each run")
+    parser.add_argument("--stress", action="store_true", help="run the concurrency stress test instead")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stress:
+        counts, errors = stress_collection()
+        print(f"{counts['writes']} writes, {counts['snapshots']} snapshots, {len(errors)} errors")
+        for error in errors[:10]:
+            print(error)
+        return 1 if errors else 0
+
+    PROFILE.update(tags=args.tags, notes=args.notes, due=args.due)
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        rows = {}
+        try:
+            for size in args.sizes:
+                rows[size] = run_benchmark(name, size, args.profile, args.memory)
+        except SkipBenchmark as e:
+            print(f"\nSkipping {name} benchmark: {e}")
+        if rows:
+            results[name] = rows
+            print_table(name, rows)
+
+    if args.json:
+        report = {
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "profile": dict(PROFILE),
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\n{len(regressions)} regression(s) against {args.compare}")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import time
+
+START = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+
+from storage import open_storage
+from task_model import NO_DUE_DATE
+from task_store import TaskStore
+
+# Deliberately no tkinter (or anything importing it): scripts start in a few tens of milliseconds
+
+SORTS = ("priority", "date", "category")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="todo", description="Work with a task list from the command line.")
+    parser.add_argument("--file", default="tasks.json", help="task file (.json, or .db for SQLite) (default: tasks.json)")
+    parser.add_argument("--benchmark", action="store_true", help="report how long each stage took, on stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a task, or many from JSON Lines on stdin")
+    add.add_argument("text", help="the task, or - to read one JSON object per line from stdin (all added as one batch)")
+    add.add_argument("--category", default="Other", choices=TaskStore.CATEGORIES)
+    add.add_argument("--priority", default="Medium", choices=TaskStore.PRIORITIES)
+    add.add_argument("--due", default=NO_DUE_DATE, help="due date, YYYY-MM-DD")
+    add.add_argument("--tags", default="", help="comma-separated tags")
+    add.add_argument("--notes", default="")
+
+    for name, help_text in (("list", "show tasks, one per line"), ("query", "print tasks as JSON Lines")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--status", default="all", choices=TaskStore.FILTERS)
+        command.add_argument("--search", default="")
+        command.add_argument("--sort", default="priority", choices=SORTS)
+        command.add_argument("--limit", type=int, default=None)
+        if name == "query":
+            command.add_argument("--fields", default="", help="comma-separated fields to print (default: all)")
+
+    complete = commands.add_parser("complete", help="mark tasks done")
+    complete.add_argument("ids", nargs="+", help="task ids, or unique prefixes of them")
+    complete.add_argument("--reopen", action="store_true", help="mark them not done instead")
+
+    import_ = commands.add_parser("import", help="import a CSV export")
+    import_.add_argument("path")
+    import_.add_argument("--keep-duplicates", action="store_true", help="also import tasks that are already in the list")
+
+    export = commands.add_parser("export", help="export tasks (.csv, .jsonl, .tcol, optionally .gz)")
+    export.add_argument("path")
+    export.add_argument("--status", default="all", choices=("all", "active", "completed"))
+    export.add_argument("--category", default=None, choices=TaskStore.CATEGORIES)
+
+    stats = commands.add_parser("stats", help="show counts")
+    stats.add_argument("--json", action="store_true")
+    return parser.parse_args(argv)
+
+
+def resolve(store, task_id):
+    """A full task id from an id or a unique prefix; raises ValueError otherwise"""
+    if task_id in store.tasks:
+        return task_id
+    matches = [task["id"] for task in store.tasks if task["id"].startswith(task_id)]
+    if len(matches) != 1:
+        raise ValueError(f"{'No' if not matches else 'More than one'} task with id {task_id}")
+    return matches[0]
+
+
+def read_jsonl(store, lines):
+    # Fresh ids for every task, so piping one list's query output into another never clashes
+    tasks = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+            fields.pop("id", None)
+            tasks.append(store.new_task(fields.pop("task", ""), **fields))
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"Line {number}: {e}")
+    return tasks
+
+
+def format_task(task):
+    due = task["due_date"] if task["due_date"] != NO_DUE_DATE else ""
+    line = f"{task['id'][:8]}  [{'x' if task['completed'] else ' '}] {task['priority']:<6} {task['category']:<8} {due:<10}  {task['task']}"
+    if task.get("tags"):
+        line += "  " + " ".join(f"#{tag}" for tag in task["tags"])
+    return line
+
+
+def write_tasks(store, ids, limit, format_line, out):
+    # Rows are written as they are formatted, so a pipe starts getting output at once
+    for count, task_id in enumerate(ids):
+        if limit is not None and count >= limit:
+            break
+        out.write(format_line(store.get(task_id)) + "\n")
+
+
+def run(args, store, out):
+    command = args.command
+    if command == "add":
+        if args.text == "-":
+            tasks = read_jsonl(store, sys.stdin)
+            store.add_many(tasks)
+            print(f"Added {len(tasks)} tasks", file=sys.stderr)
+        else:
+            tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+            task = store.add(args.text, args.category, args.priority, args.due, tags=tags, notes=args.notes)
+            out.write(task["id"] + "\n")
+    elif command in ("list", "query"):
+        ids = store.query(args.status, args.search, args.sort)
+        if command == "list":
+            format_line = format_task
+        else:
+            fields = [field.strip() for field in args.fields.split(",") if field.strip()]
+            format_line = lambda task: json.dumps({field: task.get(field) for field in fields} if fields else dict(task))
+        write_tasks(store, ids, args.limit, format_line, out)
+    elif command == "complete":
+        ids = [resolve(store, task_id) for task_id in args.ids]
+        store.complete_many(ids, completed=not args.reopen)
+    elif command == "import":
+        imported, skipped = store.import_csv(args.path, dedupe=not args.keep_duplicates)
+        print(f"Imported {imported} tasks ({skipped} duplicates skipped)", file=sys.stderr)
+    elif command == "export":
+        count = store.export(args.path, args.status, args.category)
+        print(f"Exported {count} tasks", file=sys.stderr)
+    elif command == "stats":
+        stats = store.stats
+        summary = {"total": stats.total, "active": stats.active, "completed": stats.completed,
+                   "completion_rate": round(stats.completion_rate, 1), "overdue": stats.overdue(),
+                   "due_today": stats.due_today(),
+                   "priority_progress": {p: round(stats.priority_progress(p), 1) for p in TaskStore.PRIORITIES}}
+        if args.json:
+            out.write(json.dumps(summary) + "\n")
+        else:
+            out.write(f"{summary['total']} tasks: {summary['active']} active, {summary['completed']} completed "
+                      f"({summary['completion_rate']}%), {summary['overdue']} overdue, {summary['due_today']} due today\n")
+            for priority, progress in summary["priority_progress"].items():
+                out.write(f"  {priority:<6} {progress:5.1f}% done\n")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timings = {"imports": time.perf_counter() - START}
+    store = TaskStore(open_storage(args.file))
+    try:
+        start = time.perf_counter()
+        store.load()
+        timings["load"] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            run(args, store, sys.stdout)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. piped into head); not an error
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except (KeyError, OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        timings[args.command] = time.perf_counter() - start
+    finally:
+        # Writes whatever the command changed
+        start = time.perf_counter()
+        store.close()
+        timings["save"] = time.perf_counter() - start
+    if args.benchmark:
+        timings["total"] = time.perf_counter() - START
+        for name, seconds in timings.items():
+            print(f"{name:<10} {seconds * 1000:9.2f}ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
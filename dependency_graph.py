@@ -0,0 +1,281 @@
+from task_model import previous_fields
+
+
+class CycleError(ValueError):
+    pass
+
+
+class DependencyGraph:
+    """Task dependencies as a graph, kept current as the collection changes.
+
+    ``prerequisites`` maps a task id to the ids it depends on and
+    ``dependents`` is the reverse index, so both directions are O(1) to
+    follow.  ``order`` holds a topological position per task that is
+    repaired locally when an edge is added (Pearce-Kelly): only the tasks
+    between the two endpoints are visited and renumbered, and the same
+    walk detects cycles.  Edges that would close a cycle (only possible
+    with a hand-edited file, the edit dialog checks first) are kept in
+    ``cyclic`` and left out of the ordering.
+
+    ``pending`` counts the unfinished prerequisites of each task, and the
+    ``ready`` / ``blocked`` sets of active tasks follow from it; completing
+    a task only touches its direct dependents.  Dependencies on ids that
+    don't exist (deleted tasks) are remembered in ``waiting`` and wired up
+    again if the task comes back.
+    """
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        tasks.subscribe(self.on_tasks_changed)
+        self.rebuild()
+
+    def on_tasks_changed(self, event, task, old):
+        if event == "reset":
+            self.rebuild()
+        elif event == "added":
+            self.add_task(task)
+        elif event == "removed":
+            self.remove_task(task)
+        elif event == "changed":
+            if "dependencies" in old:
+                self.set_dependencies(task["id"], previous_fields(task, old).get("dependencies") or (),
+                                      task.get("dependencies") or ())
+            if "completed" in old and bool(old["completed"]) != bool(task["completed"]):
+                self._completion_changed(task)
+
+    def rebuild(self):
+        self.prerequisites = {}
+        self.dependents = {}
+        self.waiting = {}
+        self.cyclic = set()
+        self.pending = {}
+        self.ready = set()
+        self.blocked = set()
+        # One pass over the tasks, then plain dict/set work
+        rows = [(task["id"], task.get("dependencies"), task["completed"]) for task in self.tasks]
+        done = {task_id: completed for task_id, _, completed in rows}
+        prerequisites, dependents, waiting = self.prerequisites, self.dependents, self.waiting
+        for task_id, _, _ in rows:
+            prerequisites[task_id] = set()
+            dependents[task_id] = set()
+        for task_id, dependencies, completed in rows:
+            pending = 0
+            deps = prerequisites[task_id]
+            for dep in dependencies or ():
+                if dep in deps:
+                    continue
+                if dep in done:
+                    deps.add(dep)
+                    dependents[dep].add(task_id)
+                    pending += not done[dep]
+                else:
+                    waiting.setdefault(dep, set()).add(task_id)
+            self.pending[task_id] = pending
+            if not completed:
+                (self.blocked if pending else self.ready).add(task_id)
+        self._order_all()
+
+    def _order_all(self):
+        # Kahn's algorithm for the initial order; whatever is left sits on a cycle
+        remaining = {node: len(deps) for node, deps in self.prerequisites.items()}
+        queue = [node for node, count in remaining.items() if not count]
+        self.order = {}
+        for node in queue:
+            self.order[node] = len(self.order)
+            for dependent in self.dependents[node]:
+                remaining[dependent] -= 1
+                if not remaining[dependent]:
+                    queue.append(dependent)
+        stuck = [node for node in self.prerequisites if node not in self.order]
+        for node in stuck:
+            self.order[node] = len(self.order)
+        self.next_order = len(self.order)
+        stuck = set(stuck)
+        edges = [(dep, node) for node in stuck for dep in self.prerequisites[node] if dep in stuck]
+        for dep, node in edges:
+            self.cyclic.add((dep, node))
+        for dep, node in edges:
+            self.cyclic.discard((dep, node))
+            try:
+                self._reorder(dep, node)
+            except CycleError:
+                self.cyclic.add((dep, node))
+
+    def add_task(self, task):
+        task_id = task["id"]
+        self.prerequisites[task_id] = set()
+        self.dependents[task_id] = set()
+        self.order[task_id] = self.next_order
+        self.next_order += 1
+        self.pending[task_id] = 0
+        for dependent in self.waiting.pop(task_id, ()):
+            self._add_edge(task_id, dependent)
+        for dep in task.get("dependencies") or ():
+            self._add_edge(dep, task_id)
+        self._update_status(task_id)
+
+    def remove_task(self, task):
+        task_id = task["id"]
+        for dep in list(self.prerequisites[task_id]):
+            self._remove_edge(dep, task_id)
+        for dependent in list(self.dependents[task_id]):
+            # The task has already left the collection, so pass on whether it was finished
+            self._remove_edge(task_id, dependent, task["completed"])
+            self.waiting.setdefault(task_id, set()).add(dependent)
+        for dep in task.get("dependencies") or ():
+            self._unwait(dep, task_id)
+        del self.prerequisites[task_id], self.dependents[task_id], self.order[task_id], self.pending[task_id]
+        self.ready.discard(task_id)
+        self.blocked.discard(task_id)
+
+    def set_dependencies(self, task_id, old, new):
+        old, new = set(old), set(new)
+        for dep in old - new:
+            self._remove_edge(dep, task_id)
+            self._unwait(dep, task_id)
+        for dep in new - old:
+            self._add_edge(dep, task_id)
+        self._update_status(task_id)
+
+    def _unwait(self, dep, task_id):
+        waiting = self.waiting.get(dep)
+        if waiting is not None:
+            waiting.discard(task_id)
+            if not waiting:
+                del self.waiting[dep]
+
+    def check(self, task_id, dependencies):
+        """Raise CycleError if giving task_id these dependencies would create a cycle"""
+        for dep in dependencies:
+            if dep == task_id:
+                raise CycleError("A task can't depend on itself!")
+            if dep in self.order and dep not in self.prerequisites[task_id] and self._reaches(task_id, dep):
+                raise CycleError("That dependency would create a cycle!")
+
+    def _reaches(self, start, target):
+        # Only tasks ordered before the target can lie on a path to it
+        bound = self.order[target]
+        if self.order[start] > bound:
+            return False
+        stack, seen = [start], {start}
+        while stack:
+            node = stack.pop()
+            if node == target:
+                return True
+            for dependent in self.dependents[node]:
+                if dependent not in seen and self.order[dependent] <= bound:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return False
+
+    def _link(self, dep, task_id):
+        if dep not in self.prerequisites:
+            self.waiting.setdefault(dep, set()).add(task_id)
+            return False
+        self.prerequisites[task_id].add(dep)
+        self.dependents[dep].add(task_id)
+        return True
+
+    def _add_edge(self, dep, task_id):
+        if dep in self.prerequisites[task_id] or not self._link(dep, task_id):
+            return
+        try:
+            self._reorder(dep, task_id)
+        except CycleError:
+            self.cyclic.add((dep, task_id))
+        if not self._is_completed(dep):
+            self.pending[task_id] += 1
+            self._update_status(task_id)
+
+    def _remove_edge(self, dep, task_id, dep_completed=None):
+        if dep not in self.prerequisites[task_id]:
+            return
+        self.prerequisites[task_id].discard(dep)
+        self.dependents[dep].discard(task_id)
+        if dep_completed is None:
+            dep_completed = self._is_completed(dep)
+        if not dep_completed:
+            self.pending[task_id] -= 1
+            self._update_status(task_id)
+        if (dep, task_id) in self.cyclic:
+            self.cyclic.discard((dep, task_id))
+        elif self.cyclic:
+            # Removing an edge may have broken a cycle, so retry the edges left out of the order
+            for edge in list(self.cyclic):
+                self.cyclic.discard(edge)
+                try:
+                    self._reorder(*edge)
+                except CycleError:
+                    self.cyclic.add(edge)
+
+    def _reorder(self, before, after):
+        """Pearce-Kelly: make order[before] < order[after] by renumbering only the affected region"""
+        low, high = self.order[after], self.order[before]
+        if low > high:
+            return
+        if before == after:
+            raise CycleError("A task can't depend on itself!")
+        forward, stack, seen = [], [after], {after}
+        while stack:
+            node = stack.pop()
+            forward.append(node)
+            for dependent in self.dependents[node]:
+                if (node, dependent) in self.cyclic:
+                    continue
+                if dependent == before:
+                    raise CycleError("That dependency would create a cycle!")
+                if dependent not in seen and self.order[dependent] < high:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        backward, stack, seen = [], [before], {before}
+        while stack:
+            node = stack.pop()
+            backward.append(node)
+            for dep in self.prerequisites[node]:
+                if (dep, node) in self.cyclic:
+                    continue
+                if dep not in seen and self.order[dep] > low:
+                    seen.add(dep)
+                    stack.append(dep)
+        order = self.order
+        forward.sort(key=order.__getitem__)
+        backward.sort(key=order.__getitem__)
+        slots = sorted(order[node] for node in backward + forward)
+        for node, slot in zip(backward + forward, slots):
+            order[node] = slot
+
+    def _is_completed(self, task_id):
+        task = self.tasks.get(task_id)
+        return task is None or bool(task["completed"])
+
+    def _update_status(self, task_id):
+        if self._is_completed(task_id):
+            self.ready.discard(task_id)
+            self.blocked.discard(task_id)
+        elif self.pending[task_id]:
+            self.blocked.add(task_id)
+            self.ready.discard(task_id)
+        else:
+            self.ready.add(task_id)
+            self.blocked.discard(task_id)
+
+    def _completion_changed(self, task):
+        step = -1 if task["completed"] else 1
+        for dependent in self.dependents[task["id"]]:
+            self.pending[dependent] += step
+            self._update_status(dependent)
+        self._update_status(task["id"])
+
+    def is_ready(self, task_id):
+        return task_id in self.ready
+
+    def is_blocked(self, task_id):
+        return task_id in self.blocked
+
+    def blockers(self, task_id):
+        """Unfinished tasks that task_id is waiting for"""
+        return [dep for dep in self.prerequisites.get(task_id, ()) if not self._is_completed(dep)]
+
+    def topological_order(self):
+        """All task ids, every task after the tasks it depends on"""
+        return sorted(self.order, key=self.order.__getitem__)
@@ -0,0 +1,85 @@
+from collections import deque
+
+
+class UndoHistory:
+    """Undo and redo steps for a TaskCollection, kept as inverse operations.
+
+    Each step is a label and the undo log of a transaction()/recording(),
+    a list of ``(op, target, old)``: ``("remove", id, None)`` for an added
+    task, ``("add", task, None)`` for a removed one and ``("update", id,
+    old)`` holding only the fields that changed, so a step costs memory in
+    proportion to what it changed, never a copy of the list.  The oldest
+    steps are dropped once there are more than ``max_steps`` or their
+    operations add up to more than ``max_ops``; a single step bigger than
+    that clears the history instead.  Once a grouped step has been
+    dropped, later batches of the same group aren't recorded either, as
+    undoing them alone would only undo part of it.
+    """
+
+    def __init__(self, tasks, max_steps=100, max_ops=1_000_000):
+        self.tasks = tasks
+        self.max_steps = max_steps
+        self.max_ops = max_ops
+        self.undo_steps = deque()  # (label, log, group), oldest first
+        self.redo_steps = []
+        self.ops = 0
+        self.dropped_group = None
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps = []
+        self.ops = 0
+
+    def record(self, label, log, group=None):
+        """Add a step; consecutive steps with the same ``group`` (e.g. the batches of one import) become one"""
+        if not log:
+            return
+        self.ops -= sum(len(step[1]) for step in self.redo_steps)
+        self.redo_steps = []
+        if group is not None and group is self.dropped_group:
+            return
+        if group is not None and self.undo_steps and self.undo_steps[-1][2] is group:
+            self.undo_steps[-1][1].extend(log)
+        else:
+            self.undo_steps.append((label, log, group))
+        self.ops += len(log)
+        self._trim()
+
+    def _trim(self):
+        while self.undo_steps and (len(self.undo_steps) > self.max_steps or self.ops > self.max_ops):
+            _, log, group = self.undo_steps.popleft()
+            self.ops -= len(log)
+            if group is not None:
+                self.dropped_group = group
+        if self.ops > self.max_ops:
+            self.clear()
+
+    @property
+    def undo_label(self):
+        return self.undo_steps[-1][0] if self.undo_steps else None
+
+    @property
+    def redo_label(self):
+        return self.redo_steps[-1][0] if self.redo_steps else None
+
+    def undo(self):
+        """Revert the last step; returns ``(label, log of the changes made)``, or None if there is none.
+
+        Raises KeyError (with nothing changed, and the step dropped) if one
+        of its tasks has been deleted since by something the history didn't
+        see, such as a sync.
+        """
+        return self._move(self.undo_steps, self.redo_steps)
+
+    def redo(self):
+        return self._move(self.redo_steps, self.undo_steps)
+
+    def _move(self, source, target):
+        if not source:
+            return None
+        label, log, _ = source.pop()
+        self.ops -= len(log)
+        inverse = self.tasks.revert(log)
+        target.append((label, inverse, None))
+        self.ops += len(inverse)
+        return label, inverse
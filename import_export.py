@@ -0,0 +1,359 @@
+import csv
+import gzip
+import io
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from perf import timed
+from storage import CSV_HEADER, task_from_csv_row, task_to_csv_row
+from task_model import Task, as_dict
+
+EXPORT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".tcol": "columnar"}
+_ABSENT = object()
+
+
+def task_key(task):
+    """Hash of the user-visible fields, used to spot tasks that are already in the list"""
+    return hash((task["task"], task["category"], task["priority"], task["due_date"],
+                 task.get("notes", ""), tuple(task.get("tags", ()))))
+
+
+class CsvImporter(threading.Thread):
+    """Parses an exported CSV on a worker thread and hands tasks over in batches.
+
+    Messages are put on ``self.queue`` for the Tk thread to pick up:
+    ``("batch", tasks, progress)`` with progress between 0 and 1, then a
+    final ``("done", imported, skipped, cancelled)`` or ``("error", message)``.
+    The queue only holds a couple of batches, so memory stays bounded by
+    the batch size however large the file is.  Rows matching an existing
+    task (or an earlier row) are skipped using a hash index of task_key(),
+    built in run() from ``existing`` (a TaskCollection is snapshotted
+    there, not on the calling thread).
+    """
+
+    def __init__(self, path, existing=(), batch_size=5000, dedupe=True):
+        super().__init__()
+        self.daemon = True
+        self.path = path
+        self.existing = existing
+        self.batch_size = batch_size
+        self.dedupe = dedupe
+        self.queue = queue.Queue(maxsize=2)
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _put(self, message, force=False):
+        # Don't block forever on a full queue once the import is cancelled
+        while force or not self.cancelled.is_set():
+            try:
+                self.queue.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @timed("import")
+    def run(self):
+        imported = skipped = 0
+        try:
+            existing = self.existing.snapshot() if hasattr(self.existing, "snapshot") else self.existing
+            seen = {task_key(task) for task in existing} if self.dedupe else set()
+            existing = None
+            self.existing = None
+            size = os.path.getsize(self.path) or 1
+            with open(self.path, "rb") as binary:
+                reader = csv.DictReader(io.TextIOWrapper(binary, newline=""))
+                batch = []
+                for row in reader:
+                    if self.cancelled.is_set():
+                        break
+                    task = task_from_csv_row(row)
+                    if self.dedupe:
+                        key = task_key(task)
+                        if key in seen:
+                            skipped += 1
+                            continue
+                        seen.add(key)
+                    batch.append(Task.from_dict(task))
+                    if len(batch) >= self.batch_size:
+                        if self._put(("batch", batch, binary.tell() / size)):
+                            imported += len(batch)
+                        batch = []
+                if batch and self._put(("batch", batch, 1.0)):
+                    imported += len(batch)
+            self._put(("done", imported, skipped, self.cancelled.is_set()), force=True)
+        except Exception as e:
+            self._put(("error", str(e)), force=True)
+
+
+def iter_tasks(tasks, status="all", category=None):
+    """Filter pushdown: drop unwanted tasks before any row is formatted"""
+    for task in tasks:
+        if status == "active" and task["completed"]:
+            continue
+        if status == "completed" and not task["completed"]:
+            continue
+        if category and task["category"] != category:
+            continue
+        yield task
+
+
+def write_csv(tasks, f):
+    writer = csv.writer(f)
+    writer.writerow(CSV_HEADER)
+    count = 0
+    for task in tasks:
+        writer.writerow(task_to_csv_row(task))
+        count += 1
+    return count
+
+
+def write_jsonl(tasks, f):
+    count = 0
+    for task in tasks:
+        f.write(json.dumps(as_dict(task)) + "\n")
+        count += 1
+    return count
+
+
+class Columnar:
+    """A compact column-oriented archive format (".tcol").
+
+    After the magic line the file is a sequence of chunks of up to
+    CHUNK_ROWS tasks.  Each chunk starts with a little-endian uint32
+    length and a JSON header describing its columns, followed by the
+    column buffers:
+
+    - "str": uint32 end offsets followed by the UTF-8 text of all rows
+    - "dict": the distinct values live in the header, the buffer holds one
+      uint16/uint32 code per row (category, priority, due date, tags...)
+    - "bool": one byte per row
+
+    Repetitive columns shrink to a few bytes per row, and a reader can
+    skip columns it doesn't need.  A column's "missing" list holds the
+    rows that don't have the field; fields outside COLUMNS, and values
+    that don't fit their column's encoding (a None id, say), go through
+    a JSON "extra" column instead, so round trips are lossless.
+    """
+
+    MAGIC = b"TCOL1\n"
+    CHUNK_ROWS = 10000
+    COLUMNS = [("id", "str"), ("task", "str"), ("completed", "bool"), ("category", "dict"),
+               ("priority", "dict"), ("due_date", "dict"), ("created_at", "str"), ("notes", "str"),
+               ("tags", "dict"), ("dependencies", "dict"), ("extra", "dict")]
+    LIST_COLUMNS = ("tags", "dependencies")
+    PLACEHOLDERS = {"str": "", "bool": False, "dict": ""}
+
+    @classmethod
+    def write(cls, tasks, f):
+        f.write(cls.MAGIC)
+        count = 0
+        chunk = []
+        for task in tasks:
+            chunk.append(task)
+            if len(chunk) >= cls.CHUNK_ROWS:
+                count += cls._write_chunk(chunk, f)
+                chunk = []
+        if chunk:
+            count += cls._write_chunk(chunk, f)
+        return count
+
+    @classmethod
+    def _column_values(cls, chunk, name, encoding, misfits):
+        # (values, rows without the field); values that don't fit the encoding are added to misfits
+        # (row -> {name: value}) for the extra column, and their rows get a placeholder here
+        if name == "extra":
+            known = {column for column, _ in cls.COLUMNS}
+            return [json.dumps(dict({k: v for k, v in task.items() if k not in known}, **misfits.get(row, {})))
+                    for row, task in enumerate(chunk)], []
+        is_list = name in cls.LIST_COLUMNS
+        kind = (list, tuple) if is_list else bool if encoding == "bool" else str
+        placeholder = "[]" if is_list else cls.PLACEHOLDERS[encoding]
+        values, missing = [], []
+        for row, task in enumerate(chunk):
+            value = task.get(name, _ABSENT)
+            if value is _ABSENT or not isinstance(value, kind):
+                missing.append(row)
+                values.append(placeholder)
+                if value is not _ABSENT:
+                    misfits.setdefault(row, {})[name] = value
+            else:
+                values.append(json.dumps(list(value)) if is_list else value)
+        return values, missing
+
+    @classmethod
+    def _write_chunk(cls, chunk, f):
+        header = {"rows": len(chunk), "columns": []}
+        buffers = []
+        misfits = {}
+        for name, encoding in cls.COLUMNS:
+            values, missing = cls._column_values(chunk, name, encoding, misfits)
+            column = {"name": name, "encoding": encoding}
+            if missing:
+                column["missing"] = missing
+            if encoding == "bool":
+                data = bytes(1 if value else 0 for value in values)
+            elif encoding == "dict":
+                codes = {}
+                for value in values:
+                    codes.setdefault(value, len(codes))
+                column["values"] = list(codes)
+                data = _pack_ints([codes[value] for value in values], "H" if len(codes) < 65536 else "I")
+                column["code_type"] = "H" if len(codes) < 65536 else "I"
+            else:
+                blobs = [value.encode("utf-8") for value in values]
+                offsets, end = [], 0
+                for blob in blobs:
+                    end += len(blob)
+                    offsets.append(end)
+                data = _pack_ints(offsets, "I") + b"".join(blobs)
+            column["size"] = len(data)
+            header["columns"].append(column)
+            buffers.append(data)
+        header_bytes = json.dumps(header).encode("utf-8")
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for data in buffers:
+            f.write(data)
+        return len(chunk)
+
+    @classmethod
+    def read(cls, f):
+        """Yield task dicts back out of a columnar archive"""
+        if f.read(len(cls.MAGIC)) != cls.MAGIC:
+            raise ValueError("Not a task archive")
+        while True:
+            size = f.read(4)
+            if not size:
+                return
+            header = json.loads(f.read(struct.unpack("<I", size)[0]))
+            rows = header["rows"]
+            columns, missing = {}, {}
+            for column in header["columns"]:
+                missing[column["name"]] = set(column.get("missing", ()))
+                data = f.read(column["size"])
+                if column["encoding"] == "bool":
+                    columns[column["name"]] = [bool(b) for b in data]
+                elif column["encoding"] == "dict":
+                    values = column["values"]
+                    columns[column["name"]] = [values[code] for code in _unpack_ints(data, column["code_type"])]
+                else:
+                    offsets = _unpack_ints(data[:4 * rows], "I")
+                    text = data[4 * rows:]
+                    start, strings = 0, []
+                    for end in offsets:
+                        strings.append(text[start:end].decode("utf-8"))
+                        start = end
+                    columns[column["name"]] = strings
+            for row in range(rows):
+                task = {}
+                for name, _ in cls.COLUMNS:
+                    if row in missing[name]:
+                        continue
+                    value = columns[name][row]
+                    if name == "extra":
+                        task.update(json.loads(value))
+                    elif name in cls.LIST_COLUMNS:
+                        task[name] = json.loads(value)
+                    else:
+                        task[name] = value
+                yield task
+
+
+def _pack_ints(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_ints(data, typecode):
+    packed = array(typecode)
+    packed.frombytes(data)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+
+def export_format(path):
+    """(format, gzipped) from a file name like tasks.jsonl.gz"""
+    base, ext = os.path.splitext(path.lower())
+    compressed = ext == ".gz"
+    if compressed:
+        ext = os.path.splitext(base)[1]
+    return EXPORT_FORMATS.get(ext, "csv"), compressed
+
+
+@timed("export")
+def export_tasks(tasks, path, status="all", category=None, fmt=None, compress=None):
+    """Stream tasks (already a snapshot) to path and return how many rows were written"""
+    guessed_format, guessed_compress = export_format(path)
+    fmt = fmt or guessed_format
+    compress = guessed_compress if compress is None else compress
+    rows = iter_tasks(tasks, status, category)
+    opener = gzip.open if compress else open
+    if fmt == "columnar":
+        with opener(path, "wb") as f:
+            return Columnar.write(rows, f)
+    with opener(path, "wt", newline="") as f:
+        if fmt == "jsonl":
+            return write_jsonl(rows, f)
+        return write_csv(rows, f)
+
+
+class TaskExporter(threading.Thread):
+    """Runs export_tasks over a snapshot of a TaskCollection on a worker thread.
+
+    The snapshot is taken in run(), so starting an export never copies
+    the list on the calling (Tk) thread.
+
+    Puts ``("done", count, seconds, cancelled)`` or ``("error", message)``
+    on ``self.queue`` when finished; cancel() stops after the current row
+    and removes the partly written file.  ``progress`` (0 to 1) can be
+    read from any thread while it runs.
+    """
+
+    def __init__(self, tasks, path, status="all", category=None):
+        super().__init__()
+        self.daemon = True
+        self.tasks = tasks
+        self.snapshot = ()
+        self.path = path
+        self.status = status
+        self.category = category
+        self.queue = queue.Queue()
+        self.cancelled = threading.Event()
+        self.read = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def progress(self):
+        return self.read / (len(self.snapshot) or 1)
+
+    def _rows(self):
+        for task in self.snapshot:
+            if self.cancelled.is_set():
+                return
+            self.read += 1
+            yield task
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.snapshot = self.tasks.snapshot()
+            count = export_tasks(self._rows(), self.path, self.status, self.category)
+            if self.cancelled.is_set():
+                os.remove(self.path)
+            self.queue.put(("done", count, time.perf_counter() - start, self.cancelled.is_set()))
+        except Exception as e:
+            self.queue.put(("error", str(e)))
@@ -0,0 +1,123 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class Histogram:
+    """The last ``window`` durations of one operation, plus lifetime count and max"""
+
+    def __init__(self, window=512):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "last": self.samples[-1] if self.samples else 0.0,
+        }
+
+
+class PerfMonitor:
+    """Rolling timings of the app's hot paths.
+
+    Functions wrapped with timed() are only measured while ``enabled`` is
+    set; otherwise the wrapper costs one attribute check, so the
+    instrumentation can stay in place permanently.  Timings may be
+    recorded from any thread.  watch_event_loop() measures how late a
+    repeating ``root.after`` callback fires, which is how long the Tk
+    event loop was blocked.
+    """
+
+    LAG_INTERVAL_MS = 100
+
+    def __init__(self, window=512):
+        self.enabled = False
+        self.window = window
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.lag_after_id = None
+
+    def record(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.window)
+            histogram.add(seconds)
+
+    def timed(self, name):
+        """Decorator that records each call's duration under ``name``"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def watch_event_loop(self, root):
+        # Re-arms itself for as long as monitoring is on
+        expected = time.perf_counter() + self.LAG_INTERVAL_MS / 1000
+
+        def tick():
+            self.lag_after_id = None
+            if not self.enabled:
+                return
+            self.record("event loop lag", max(0.0, time.perf_counter() - expected))
+            self.watch_event_loop(root)
+
+        self.lag_after_id = root.after(self.LAG_INTERVAL_MS, tick)
+
+    def set_enabled(self, enabled, root=None):
+        self.enabled = enabled
+        if enabled and root is not None and self.lag_after_id is None:
+            self.watch_event_loop(root)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def report(self):
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def format_report(self):
+        lines = [f"{'operation':<20} {'count':>7} {'p50':>10} {'p95':>10} {'max':>10}"]
+        for name, summary in self.report().items():
+            lines.append(f"{name:<20} {summary['count']:>7} " +
+                         " ".join(f"{summary[key] * 1000:>8.2f}ms" for key in ("p50", "p95", "max")))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                       "timings": self.report()}, f, indent=2)
+
+
+monitor = PerfMonitor()
+timed = monitor.timed
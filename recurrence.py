@@ -0,0 +1,199 @@
+import calendar
+import heapq
+from datetime import date, timedelta
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def make_rule(freq, start, interval=1, weekdays=(), until=None, count=None):
+    """A recurrence rule as stored in a task's "recurrence" field; raises ValueError if it makes no sense.
+
+    ``start`` is the first occurrence, ``weekdays`` (weekly rules only)
+    are 0 for Monday to 6 for Sunday, and the series ends after ``until``
+    or after ``count`` occurrences, whichever comes first.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Repeat must be one of {', '.join(FREQUENCIES)}!")
+    rule = {"freq": freq, "start": _parse_date(start, "start date")}
+    try:
+        interval = int(interval)
+    except (TypeError, ValueError):
+        interval = 0
+    if interval < 1:
+        raise ValueError("Repeat interval must be a whole number of at least 1!")
+    if interval != 1:
+        rule["interval"] = interval
+    if weekdays:
+        if freq != "weekly":
+            raise ValueError("Weekdays only apply to weekly repeats!")
+        rule["weekdays"] = sorted(set(weekdays))
+    if until:
+        rule["until"] = _parse_date(until, "end date")
+        if rule["until"] < rule["start"]:
+            raise ValueError("The repeat ends before it starts!")
+    if count not in (None, ""):
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            count = 0
+        if count < 1:
+            raise ValueError("Number of repeats must be a whole number of at least 1!")
+        rule["count"] = count
+    return rule
+
+
+def default_start(task):
+    """Where a new rule for a task starts: its current rule's start, its due date, or today"""
+    if task.get("recurrence"):
+        return task["recurrence"]["start"]
+    try:
+        return date.fromisoformat(task["due_date"]).isoformat()
+    except (TypeError, ValueError):
+        return date.today().isoformat()
+
+
+def _parse_date(value, what):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"The {what} must look like 2024-05-31!")
+
+
+def parse_weekdays(text):
+    """"mon, wed" -> [0, 2]"""
+    weekdays = []
+    for name in (part.strip().lower()[:3] for part in text.split(",")):
+        if not name:
+            continue
+        if name not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday {name}!")
+        weekdays.append(WEEKDAYS.index(name))
+    return weekdays
+
+
+def describe(rule):
+    interval = rule.get("interval", 1)
+    unit = {"daily": "day", "weekly": "week", "monthly": "month", "yearly": "year"}[rule["freq"]]
+    text = f"every {unit}" if interval == 1 else f"every {interval} {unit}s"
+    if rule.get("weekdays"):
+        text += " on " + ", ".join(WEEKDAYS[day] for day in rule["weekdays"])
+    if rule.get("until"):
+        text += f" until {rule['until']}"
+    if rule.get("count"):
+        text += f", {rule['count']} times"
+    return text
+
+
+def _add_months(start, months):
+    # Keep the day of the month, clamped to short months (Jan 31 -> Feb 28 -> Mar 31)
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _dates(rule, start, after):
+    # (occurrence number, date) from the first occurrence after ``after``, jumping straight there
+    interval = rule.get("interval", 1)
+    freq = rule["freq"]
+    if freq == "weekly" and rule.get("weekdays"):
+        weekdays = rule["weekdays"]
+        week0 = start - timedelta(days=start.weekday())
+        first_week = sum(1 for day in weekdays if day >= start.weekday())
+        week = 0
+        if after is not None and after > start:
+            week = (after - week0).days // 7 // interval
+        while True:
+            number = 0 if week == 0 else first_week + (week - 1) * len(weekdays)
+            for day in weekdays:
+                when = week0 + timedelta(days=7 * week * interval + day)
+                if when >= start:
+                    yield number, when
+                    number += 1
+            week += 1
+    elif freq in ("daily", "weekly"):
+        step = interval * (7 if freq == "weekly" else 1)
+        index = 0
+        if after is not None and after >= start:
+            index = (after - start).days // step + 1
+        while True:
+            yield index, start + timedelta(days=index * step)
+            index += 1
+    else:
+        step = interval * (12 if freq == "yearly" else 1)
+        index = 0
+        if after is not None and after > start:
+            index = ((after.year - start.year) * 12 + after.month - start.month) // step
+        while True:
+            yield index, _add_months(start, index * step)
+            index += 1
+
+
+def occurrences(rule, after=None, until=None):
+    """The rule's occurrence dates in order, generated lazily.
+
+    Only dates after ``after`` and up to ``until`` (dates, both optional)
+    are produced, and the generator starts right at ``after`` instead of
+    walking from the rule's start, so a window costs the same however
+    long the series has been running.
+    """
+    start = date.fromisoformat(rule["start"])
+    end = date.fromisoformat(rule["until"]) if rule.get("until") else None
+    if until is not None and (end is None or until < end):
+        end = until
+    count = rule.get("count")
+    dates = _dates(rule, start, after)
+    while True:
+        try:
+            index, when = next(dates)
+        except (OverflowError, ValueError):
+            return  # Past the year 9999
+        if (end is not None and when > end) or (count is not None and index >= count):
+            return
+        if after is None or when > after:
+            yield when
+
+
+def next_occurrence(rule, current):
+    """The occurrence after ``current`` (an ISO date string), as a string, or None when the series is over"""
+    try:
+        current = date.fromisoformat(current)
+    except (TypeError, ValueError):
+        current = None
+    when = next(occurrences(rule, after=current), None)
+    return when.isoformat() if when else None
+
+
+def first_occurrence(rule, day=None):
+    """The first occurrence on or after ``day`` (an ISO date string, default the rule's start), or None.
+
+    The start itself isn't always one: a weekly rule starting on a Tuesday
+    but only repeating on Mondays and Thursdays first falls on Thursday.
+    """
+    try:
+        after = date.fromisoformat(day) - timedelta(days=1)
+    except (TypeError, ValueError):
+        after = None
+    when = next(occurrences(rule, after=after), None)
+    return when.isoformat() if when else None
+
+
+def upcoming(tasks, first, last):
+    """``(date, task)`` for the open occurrences of the recurring tasks between two dates, in date order.
+
+    Occurrences before a task's due date have been completed already.
+    A lazy k-way merge of one generator per task, so memory stays
+    proportional to the number of rules, not occurrences.
+    """
+    def series(task):
+        after = first - timedelta(days=1)
+        try:
+            after = max(after, date.fromisoformat(task["due_date"]) - timedelta(days=1))
+        except (TypeError, ValueError):
+            pass
+        for when in occurrences(task["recurrence"], after=after, until=last):
+            yield when, task["id"], task
+
+    streams = [series(task) for task in tasks if task.get("recurrence") and not task["completed"]]
+    for when, _, task in heapq.merge(*streams):
+        yield when, task
@@ -0,0 +1,132 @@
+import heapq
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from perf import timed
+
+REMINDER_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def reminder_times(task):
+    """(timestamp, key, kind) for every reminder of a task; key identifies it for de-duplication"""
+    times = []
+    if task["due_date"] != "No due date":
+        try:
+            due = datetime.combine(date.fromisoformat(task["due_date"]), datetime.min.time())
+            times.append((due, f"due {task['due_date']}", "due"))
+        except ValueError:
+            pass
+    for reminder in task.get("reminders") or ():
+        try:
+            times.append((datetime.strptime(reminder, REMINDER_FORMAT), f"at {reminder}", "reminder"))
+        except ValueError:
+            pass
+    return times
+
+
+class ReminderScheduler:
+    """Fires task reminders from a min-heap of pre-parsed timestamps.
+
+    The worker thread sleeps on a condition variable until the earliest
+    reminder is due, so it costs nothing while idle no matter how many
+    tasks there are.  Task changes push fresh heap entries and wake the
+    thread; entries from an older version of a task are skipped when they
+    come up.  Each reminder fires at most once per run; reminders whose
+    day has already passed are dropped instead of firing late.
+    ``notify(task_id, kind)`` is called from the worker thread.
+    """
+
+    WATCHED_FIELDS = ("due_date", "completed", "reminders")
+    MAX_SLEEP = 3600  # Re-check the wall clock now and then in case it jumped
+
+    def __init__(self, tasks, notify):
+        self.tasks = tasks
+        self.notify = notify
+        self.heap = []
+        self.versions = {}
+        self.fired = set()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        tasks.subscribe(self.on_tasks_changed)
+        self.reschedule_all()
+
+    def on_tasks_changed(self, event, task, old):
+        if event == "reset":
+            self.reschedule_all()
+        elif event == "removed":
+            with self.cond:
+                self.versions.pop(task["id"], None)
+        elif event == "added" or (event == "changed" and any(field in old for field in self.WATCHED_FIELDS)):
+            with self.cond:
+                self._schedule(task)
+                self.cond.notify()
+
+    @timed("reminder schedule")
+    def reschedule_all(self):
+        with self.cond:
+            self.heap = []
+            self.versions = {}
+            for task in self.tasks:
+                self._schedule(task)
+            self.cond.notify()
+
+    def _schedule(self, task):
+        version = self.versions.get(task["id"], 0) + 1
+        self.versions[task["id"]] = version
+        if task["completed"]:
+            return
+        for when, key, kind in reminder_times(task):
+            if (task["id"], key) not in self.fired:
+                heapq.heappush(self.heap, (when.timestamp(), task["id"], version, key, kind))
+        # Keep the heap from filling up with stale entries after many edits
+        if len(self.heap) > 2 * len(self.versions) + 64:
+            self.heap = [entry for entry in self.heap if self.versions.get(entry[1]) == entry[2]]
+            heapq.heapify(self.heap)
+
+    @timed("reminder sweep")
+    def _pop_due(self):
+        # Called with the condition held
+        due = []
+        now = datetime.now()
+        while self.heap and self.heap[0][0] <= time.time():
+            timestamp, task_id, version, key, kind = heapq.heappop(self.heap)
+            if self.versions.get(task_id) != version or (task_id, key) in self.fired:
+                continue
+            self.fired.add((task_id, key))
+            # Only remind on the day itself, not about reminders missed while the app was closed
+            when = datetime.fromtimestamp(timestamp)
+            if now < datetime.combine(when.date() + timedelta(days=1), datetime.min.time()):
+                due.append((task_id, kind))
+        return due
+
+    def start(self):
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.stopped:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    delay = self.heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(min(delay, self.MAX_SLEEP))
+                if self.stopped:
+                    return
+                due = self._pop_due()
+            for task_id, kind in due:
+                self.notify(task_id, kind)
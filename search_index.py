@@ -0,0 +1,126 @@
+import re
+from bisect import bisect_left
+
+WORD_RE = re.compile(r"\w+")
+
+
+def searchable_text(task):
+    # Fields are joined with newlines so a match can't span two of them
+    return "\n".join([task["task"], task.get("notes", ""), task["category"]] + list(task.get("tags", []))).lower()
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """Inverted index over task text, notes, category and tags.
+
+    Each task's text is split into word tokens; ``postings`` maps a token
+    to the ids of the tasks containing it and ``token_grams`` maps each
+    trigram to the tokens containing it.  A substring query only has to
+    look at the (small) vocabulary, then unions the postings of the
+    matching tokens.  The index follows the collection it is attached to,
+    so it never needs a full rebuild after load/import.
+    """
+
+    SEARCH_FIELDS = ("task", "notes", "category", "tags")
+
+    def __init__(self, tasks=None):
+        self.texts = {}
+        self.postings = {}
+        self.token_grams = {}
+        self._sorted_tokens = None
+        self.tasks = tasks
+        if tasks is not None:
+            tasks.subscribe(self.on_tasks_changed)
+            self.rebuild(tasks)
+
+    def on_tasks_changed(self, event, task, old):
+        if event == "added":
+            self.add(task)
+        elif event == "removed":
+            self.remove(task["id"])
+        elif event == "changed" and any(field in old for field in self.SEARCH_FIELDS):
+            self.remove(task["id"])
+            self.add(task)
+        elif event == "reset":
+            self.rebuild(self.tasks)
+
+    def rebuild(self, tasks):
+        self.texts = {}
+        self.postings = {}
+        self.token_grams = {}
+        self._sorted_tokens = None
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task):
+        text = searchable_text(task)
+        self.texts[task["id"]] = text
+        for token in set(WORD_RE.findall(text)):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                for gram in trigrams(token):
+                    self.token_grams.setdefault(gram, set()).add(token)
+                self._sorted_tokens = None
+            ids.add(task["id"])
+
+    def remove(self, task_id):
+        text = self.texts.pop(task_id, None)
+        if text is None:
+            return
+        for token in set(WORD_RE.findall(text)):
+            ids = self.postings[token]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[token]
+                for gram in trigrams(token):
+                    tokens = self.token_grams[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self.token_grams[gram]
+                self._sorted_tokens = None
+
+    def tokens_containing(self, part):
+        if len(part) < 3:
+            return [token for token in self.postings if part in token]
+        grams = sorted((self.token_grams.get(gram, ()) for gram in trigrams(part)), key=len)
+        candidates = set(grams[0]).intersection(*grams[1:])
+        return [token for token in candidates if part in token]
+
+    def search(self, query):
+        """Ids of all tasks whose text contains query (case-insensitive substring)"""
+        query = query.lower()
+        parts = WORD_RE.findall(query)
+        if not parts:
+            # Nothing indexable (punctuation, emoji...), fall back to a scan
+            return {task_id for task_id, text in self.texts.items() if query in text}
+        # Any run of word characters in a match lies inside one token of the task
+        result = None
+        for part in sorted(set(parts), key=len, reverse=True):
+            ids = set()
+            for token in self.tokens_containing(part):
+                ids |= self.postings[token]
+            result = ids if result is None else result & ids
+            if not result:
+                return result
+        if parts != [query]:
+            result = {task_id for task_id in result if query in self.texts[task_id]}
+        return result
+
+    def prefix(self, query):
+        """Ids of tasks with a word starting with query"""
+        query = query.lower()
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self.postings)
+        result = set()
+        index = bisect_left(self._sorted_tokens, query)
+        while index < len(self._sorted_tokens) and self._sorted_tokens[index].startswith(query):
+            result |= self.postings[self._sorted_tokens[index]]
+            index += 1
+        return result
+
+    def matches(self, task_id, query):
+        return query.lower() in self.texts.get(task_id, "")
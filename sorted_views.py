@@ -0,0 +1,141 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+PRIORITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+NO_DUE_DATE = date.max.toordinal() + 1
+
+
+def due_ordinal(due_date):
+    # Tasks without a (valid) due date sort after every real date
+    try:
+        return date.fromisoformat(due_date).toordinal()
+    except (TypeError, ValueError):
+        return NO_DUE_DATE
+
+
+SORT_KEYS = {
+    "priority": lambda task: (PRIORITY_ORDER.get(task["priority"], 3), due_ordinal(task["due_date"])),
+    "date": lambda task: (due_ordinal(task["due_date"]),),
+    "category": lambda task: (task["category"], task["priority"]),
+}
+SORT_FIELDS = {"priority": ("priority", "due_date"), "date": ("due_date",), "category": ("category", "priority")}
+SORTED_FIELDS = {field for fields in SORT_FIELDS.values() for field in fields}
+
+
+class SortedView:
+    """The ids of all tasks in one sort order, kept sorted with bisect.
+
+    ``entries`` holds ``(key, seq)`` pairs parallel to ``ids``, where key
+    is the precomputed sort tuple and seq the task's position in the
+    collection, so equal keys keep collection order just like a stable
+    sort and every entry can be found again exactly.
+    """
+
+    def __init__(self, key_func):
+        self.key_func = key_func
+        self.entries = []
+        self.ids = []
+        self.keys = {}
+
+    def build(self, tasks, order):
+        keyed = sorted(((self.key_func(task), order[task["id"]]), task["id"]) for task in tasks)
+        self.entries = [entry for entry, _ in keyed]
+        self.ids = [task_id for _, task_id in keyed]
+        self.keys = dict(zip(self.ids, self.entries))
+
+    def insert(self, task, seq):
+        entry = (self.key_func(task), seq)
+        index = bisect_right(self.entries, entry)
+        self.entries.insert(index, entry)
+        self.ids.insert(index, task["id"])
+        self.keys[task["id"]] = entry
+
+    def discard(self, task_id):
+        entry = self.keys.pop(task_id, None)
+        if entry is None:
+            return
+        index = bisect_left(self.entries, entry)
+        del self.entries[index]
+        del self.ids[index]
+
+
+class SortedViews:
+    """Sorted views of a TaskCollection, one per sort mode.
+
+    A view is built the first time its mode is asked for and from then on
+    follows the collection one bisect insert/remove per mutation, so
+    switching the sort order never re-sorts.  Views are dropped on reset
+    and once a batch has changed more than ``REBUILD_FRACTION`` of the
+    list (a single sort is then cheaper than the list inserts), and
+    rebuilt lazily; smaller batches such as an undo are followed like
+    single changes.
+    """
+
+    REBUILD_FRACTION = 0.01
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        tasks.subscribe(self.on_tasks_changed)
+        self.renumber()
+
+    def renumber(self):
+        self.order = {task["id"]: seq for seq, task in enumerate(self.tasks)}
+        self.next_seq = len(self.order)
+        self.views = {}
+        self.batch_changes = 0
+        self.removed = (None, None)  # (id, seq) of the task removed last, for old_entry()
+
+    def on_tasks_changed(self, event, task, old):
+        if event == "reset":
+            self.renumber()
+            return
+        if event == "batch":
+            self.batch_changes = 0
+            return
+        if event == "added":
+            self.order[task["id"]] = self.next_seq
+            self.next_seq += 1
+        if self.tasks.batching and (event != "changed" or any(field in old for field in SORTED_FIELDS)):
+            self.batch_changes += 1
+            if self.batch_changes > len(self.tasks) * self.REBUILD_FRACTION:
+                self.views = {}
+        for mode, view in self.views.items():
+            if event == "changed" and not any(field in old for field in SORT_FIELDS[mode]):
+                continue
+            if event != "added":
+                view.discard(task["id"])
+            if event != "removed":
+                view.insert(task, self.order[task["id"]])
+        if event == "removed":
+            self.removed = (task["id"], self.order.pop(task["id"]))
+
+    def view(self, mode):
+        view = self.views.get(mode)
+        if view is None and mode in SORT_KEYS:
+            view = self.views[mode] = SortedView(SORT_KEYS[mode])
+            view.build(self.tasks, self.order)
+        return view
+
+    def ids(self, mode):
+        """All task ids in display order (the live list, don't modify it)"""
+        view = self.view(mode)
+        return view.ids if view else [task["id"] for task in self.tasks]
+
+    def entry(self, mode, task_id):
+        """The precomputed, unique sort entry of a task"""
+        view = self.view(mode)
+        return view.keys[task_id] if view else self.order[task_id]
+
+    def old_entry(self, mode, task, old=None):
+        """The entry a task had before the "changed" or "removed" event being notified"""
+        seq = self.order.get(task["id"])
+        if seq is None and self.removed[0] == task["id"]:
+            seq = self.removed[1]
+        if mode not in SORT_KEYS:
+            return seq
+        return (SORT_KEYS[mode]({**task, **old} if old else task), seq)
+
+    def sort(self, mode, task_ids):
+        """Order a subset of ids (e.g. search results) using the precomputed keys"""
+        view = self.view(mode)
+        return sorted(task_ids, key=view.keys.__getitem__ if view else self.order.__getitem__)
@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import date
+
+from task_model import previous_fields
+
+
+class TaskStats:
+    """Running counts over a TaskCollection, kept current in O(1) per mutation.
+
+    Counts are broken down by status, priority, category and tag.  Due
+    dates of active tasks are counted per day, so overdue and due-today
+    figures only look at distinct dates, never at the tasks themselves.
+    A full pass only happens on reset (load/import of a whole file).
+    """
+
+    TRACKED_FIELDS = ("completed", "priority", "category", "tags", "due_date")
+
+    def __init__(self, tasks=None):
+        self.tasks = tasks
+        self.clear()
+        if tasks is not None:
+            tasks.subscribe(self.on_tasks_changed)
+            self.rebuild(tasks)
+
+    def clear(self):
+        self.total = 0
+        self.completed = 0
+        self.by_priority = Counter()
+        self.completed_by_priority = Counter()
+        self.by_category = Counter()
+        self.completed_by_category = Counter()
+        self.by_tag = Counter()
+        self.active_due = Counter()  # "YYYY-MM-DD" -> number of active tasks due that day
+
+    def rebuild(self, tasks):
+        self.clear()
+        for task in tasks:
+            self.count(task, 1)
+
+    def on_tasks_changed(self, event, task, old):
+        if event == "added":
+            self.count(task, 1)
+        elif event == "removed":
+            self.count(task, -1)
+        elif event == "changed" and any(field in old for field in self.TRACKED_FIELDS):
+            self.count(previous_fields(task, old), -1)
+            self.count(task, 1)
+        elif event == "reset":
+            self.rebuild(self.tasks)
+
+    def count(self, task, sign):
+        self.total += sign
+        done = task["completed"]
+        if done:
+            self.completed += sign
+        self._bump(self.by_priority, task["priority"], sign)
+        self._bump(self.by_category, task["category"], sign)
+        if done:
+            self._bump(self.completed_by_priority, task["priority"], sign)
+            self._bump(self.completed_by_category, task["category"], sign)
+        for tag in task.get("tags") or ():
+            self._bump(self.by_tag, tag, sign)
+        if not done and task["due_date"] != "No due date":
+            self._bump(self.active_due, task["due_date"], sign)
+
+    def _bump(self, counter, key, sign):
+        value = counter[key] + sign
+        if value:
+            counter[key] = value
+        else:
+            del counter[key]
+
+    @property
+    def active(self):
+        return self.total - self.completed
+
+    @property
+    def completion_rate(self):
+        return (self.completed / self.total * 100) if self.total > 0 else 0
+
+    def priority_progress(self, priority):
+        total = self.by_priority[priority]
+        return (self.completed_by_priority[priority] / total * 100) if total else 0
+
+    def overdue(self, today=None):
+        today = (today or date.today()).strftime("%Y-%m-%d")
+        return sum(count for day, count in self.active_due.items() if day < today)
+
+    def due_today(self, today=None):
+        return self.active_due[(today or date.today()).strftime("%Y-%m-%d")]
@@ -0,0 +1,532 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import datetime
+
+from task_model import as_dict
+
+CSV_HEADER = ["Task", "Category", "Priority", "Due Date", "Completed", "Notes", "Tags"]
+
+
+def new_task_id():
+    return uuid.uuid4().hex
+
+
+def ensure_ids(tasks):
+    """Give every task loaded from an older file a persistent id and id-based dependencies.
+
+    Returns whether any task had to change; new ids and migrated
+    dependencies only persist once the list is saved, so the caller should
+    then write it all.
+    """
+    changed = False
+    for task in tasks:
+        if not task.get("id"):
+            task["id"] = new_task_id()
+            changed = True
+    ids = {task["id"] for task in tasks}
+    for task in tasks:
+        dependencies = task.get("dependencies")
+        if dependencies and not all(dep in ids for dep in dependencies):
+            task["dependencies"] = migrate_dependencies(dependencies, tasks, ids)
+            changed = True
+    return changed
+
+
+def migrate_dependencies(dependencies, tasks, ids):
+    # Older files stored 1-based task numbers, which only made sense for the list order at the time;
+    # file order is the best guess, and numbers that point nowhere are dropped
+    migrated = []
+    for dep in dependencies:
+        if dep not in ids:
+            try:
+                dep = tasks[int(dep) - 1]["id"] if int(dep) > 0 else None
+            except (ValueError, IndexError):
+                dep = None
+        if dep is not None and dep not in migrated:
+            migrated.append(dep)
+    return migrated
+
+
+def prepare_task(task):
+    """Per-task part of ensure_ids for streamed loads; numbered dependencies are migrated once all tasks are in"""
+    if not task.get("id"):
+        task["id"] = new_task_id()
+    dependencies = task.get("dependencies")
+    if dependencies and not all(isinstance(dep, str) for dep in dependencies):
+        task["dependencies"] = [str(dep) for dep in dependencies]
+    return task
+
+
+def iter_json_array(f, chunk_size=1 << 20):
+    """Yield the items of a JSON array from a text file one at a time, reading it in chunks"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    state = "start"  # then "first" (after "["), "value" (after ",") or "next" (after a value)
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of the task file")
+            chunk = f.read(chunk_size)
+            buffer, pos, eof = chunk, 0, not chunk
+            continue
+        char = buffer[pos]
+        if state == "start":
+            if char != "[":
+                raise ValueError("The task file doesn't hold a list of tasks")
+            pos += 1
+            state = "first"
+        elif char == "]" and state in ("first", "next"):
+            return
+        elif state == "next":
+            if char != ",":
+                raise ValueError("Malformed task file: expected ',' between tasks")
+            pos += 1
+            state = "value"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            after = end
+            while after is not None and after < len(buffer) and buffer[after] in " \t\r\n":
+                after += 1
+            if not eof and (end is None or after == len(buffer) or buffer[after] not in ",]"):
+                # The value may continue in the next chunk (a cut-off number looks complete too)
+                chunk = f.read(chunk_size)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            yield value
+            pos = end
+            state = "next"
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def task_to_csv_row(task):
+    return [
+        task["task"],
+        task["category"],
+        task["priority"],
+        task["due_date"],
+        task["completed"],
+        task.get("notes", ""),
+        ", ".join(task.get("tags", []))
+    ]
+
+
+def task_from_csv_row(row):
+    return {
+        "id": new_task_id(),
+        "task": row["Task"],
+        "category": row["Category"],
+        "priority": row["Priority"],
+        "due_date": row["Due Date"],
+        "completed": row["Completed"].lower() == "true",
+        "notes": row["Notes"],
+        "tags": [tag.strip() for tag in row["Tags"].split(",") if tag.strip()],
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def task_list(tasks):
+    # save() may get a callable (e.g. TaskCollection.snapshot) so the full list is only built when needed
+    return tasks() if callable(tasks) else tasks
+
+
+def atomic_write(path, data, fsync=True):
+    """Write bytes to path via a temp file and rename so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_dir(path)
+
+
+def _fsync_dir(path):
+    # Make the rename itself durable (not supported on Windows)
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JsonStorage:
+    """The original storage: every save rewrites the whole tasks.json"""
+
+    def __init__(self, path="tasks.json", fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.upgraded = False  # the last load gave tasks new ids or dependencies, which only a save keeps
+
+    def load(self):
+        self.upgraded = False
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as f:
+            tasks = json.load(f)
+        self.upgraded = ensure_ids(tasks)
+        return tasks
+
+    def load_batches(self, batch_size=5000):
+        """Stream the tasks in lists of batch_size; see prepare_task"""
+        self.upgraded = False
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            yield from batched(map(self._prepare, iter_json_array(f)), batch_size)
+
+    def _prepare(self, task):
+        if not task.get("id"):
+            self.upgraded = True
+        return prepare_task(task)
+
+    def save(self, tasks, changes=None):
+        """Write every task; returns the number of bytes written"""
+        data = json.dumps([as_dict(task) for task in task_list(tasks)]).encode("utf-8")
+        atomic_write(self.path, data, self.fsync)
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class JournalStorage:
+    """Snapshot file plus an append-only journal of task mutations.
+
+    The snapshot keeps the tasks.json schema (a JSON list of task dicts).
+    Each save appends one JSON line per change to ``<path>.journal``:
+    ``{"op": "put", "task": {...}}`` for added/edited tasks and
+    ``{"op": "delete", "id": ...}`` for removed ones.  Once the journal
+    grows past ``compact_bytes`` it is rotated and folded into a new
+    snapshot on a background thread.
+    """
+
+    def __init__(self, path="tasks.json", compact_bytes=4 * 1024 * 1024, fsync=True):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.rotated_path = f"{path}.journal.1"
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        self.journal_size = 0
+        self._journal = None
+        self._compact_thread = None
+        self.upgraded = False  # as in JsonStorage
+
+    def load(self):
+        tasks = {}
+        self.upgraded = False
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                snapshot = json.load(f)
+            self.upgraded = ensure_ids(snapshot)
+            for task in snapshot:
+                tasks[task["id"]] = task
+        # A rotated journal is only left behind if compaction was interrupted
+        for journal_path in (self.rotated_path, self.journal_path):
+            if os.path.exists(journal_path):
+                self._replay(journal_path, tasks)
+        if os.path.exists(self.journal_path):
+            self.journal_size = os.path.getsize(self.journal_path)
+        return list(tasks.values())
+
+    def load_batches(self, batch_size=5000):
+        """The same tasks as load(), in lists of batch_size, streamed while the snapshot is read.
+
+        The journal is read first and reduced to its net effect, so every
+        snapshot task can be patched (or dropped) as it goes by.
+        """
+        replaced, appended = self._journal_changes()
+        self.upgraded = False
+        if os.path.exists(self.journal_path):
+            self.journal_size = os.path.getsize(self.journal_path)
+
+        def tasks():
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    for task in iter_json_array(f):
+                        task = self._prepare(task)
+                        if task["id"] in replaced:
+                            task, _ = replaced.pop(task["id"])
+                            if task is None:
+                                continue
+                        yield task
+            # Journaled tasks that weren't in the snapshot, in the order load() would put them
+            leftovers = [(seq, task) for task, seq in replaced.values() if task is not None]
+            leftovers.extend((seq, task) for task, seq in appended.values())
+            for _, task in sorted(leftovers, key=lambda item: item[0]):
+                yield prepare_task(task)
+
+        yield from batched(tasks(), batch_size)
+
+    def _prepare(self, task):
+        if not task.get("id"):
+            self.upgraded = True
+        return prepare_task(task)
+
+    def _journal_changes(self):
+        # Net effect of the journals without the snapshot: ``replaced`` maps an id to (new version or
+        # None if deleted, seq) and ``appended`` holds tasks re-added after a delete, which load()
+        # moves to the end. seq orders the tasks that end up after the snapshot's.
+        replaced, appended = {}, {}
+        seq = 0
+        for journal_path in (self.rotated_path, self.journal_path):
+            if not os.path.exists(journal_path):
+                continue
+            for record in self._records(journal_path):
+                seq += 1
+                if record["op"] == "put":
+                    task = record["task"]
+                    task_id = task["id"]
+                    if task_id in appended:
+                        appended[task_id] = (task, appended[task_id][1])
+                    elif task_id in replaced and replaced[task_id][0] is None:
+                        appended[task_id] = (task, seq)
+                    else:
+                        replaced[task_id] = (task, replaced[task_id][1] if task_id in replaced else seq)
+                elif record["op"] == "delete":
+                    if appended.pop(record["id"], None) is None:
+                        replaced[record["id"]] = (None, seq)
+        return replaced, appended
+
+    def _records(self, journal_path):
+        with open(journal_path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn write from a crash; everything after it is lost anyway
+                    return
+
+    def _replay(self, journal_path, tasks):
+        for record in self._records(journal_path):
+            if record["op"] == "put":
+                task = record["task"]
+                tasks[task["id"]] = task
+            elif record["op"] == "delete":
+                tasks.pop(record["id"], None)
+
+    def save(self, tasks, changes=None):
+        """Append changes to the journal, or write a full snapshot when changes is None.
+
+        Returns the number of bytes written (not counting a background compaction).
+        """
+        if changes is None:
+            self.wait_for_compaction()
+            self._close_journal()
+            data = json.dumps([as_dict(task) for task in task_list(tasks)]).encode("utf-8")
+            atomic_write(self.path, data, self.fsync)
+            for journal_path in (self.rotated_path, self.journal_path):
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+            self.journal_size = 0
+            return len(data)
+
+        data = "".join(self._encode(op, task) for op, task in changes).encode("utf-8")
+        if not data:
+            return 0
+        if self._journal is None:
+            self._journal = open(self.journal_path, "ab")
+        self._journal.write(data)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.journal_size += len(data)
+
+        if self.journal_size >= self.compact_bytes:
+            self.compact(task_list(tasks))
+        return len(data)
+
+    def _encode(self, op, task):
+        if op == "delete":
+            return json.dumps({"op": "delete", "id": task["id"]}) + "\n"
+        return json.dumps({"op": "put", "task": as_dict(task)}) + "\n"
+
+    def compact(self, tasks):
+        """Rotate the journal and fold it into a fresh snapshot in the background"""
+        if self._compact_thread and self._compact_thread.is_alive():
+            return
+        self._close_journal()
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.rotated_path)
+        self.journal_size = 0
+        # Copy on the calling thread so later edits don't leak into the snapshot
+        snapshot = [dict(task) for task in tasks]
+        self._compact_thread = threading.Thread(target=self._write_snapshot, args=(snapshot,))
+        self._compact_thread.daemon = True
+        self._compact_thread.start()
+
+    def _write_snapshot(self, snapshot):
+        atomic_write(self.path, json.dumps(snapshot).encode("utf-8"), self.fsync)
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def wait_for_compaction(self):
+        if self._compact_thread:
+            self._compact_thread.join()
+            self._compact_thread = None
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def close(self):
+        self.wait_for_compaction()
+        self._close_journal()
+
+
+class SqliteStorage:
+    """Tasks kept in a SQLite database, one row per task.
+
+    Saves only write the rows that changed, so a big list doesn't cost a
+    full rewrite per save.  load() reads every row: filtering, searching
+    and sorting are answered from the in-memory indexes, so the only
+    indexes here are the ones writes need.  The connection may be used
+    from the autosave thread and the Tk thread, so every statement runs
+    under ``self.lock``.
+    """
+
+    COLUMNS = ("id", "task", "completed", "category", "priority", "due_date", "created_at", "notes")
+
+    def __init__(self, path="tasks.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                task TEXT NOT NULL,
+                completed INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                due_date TEXT,
+                created_at TEXT,
+                notes TEXT,
+                extra TEXT
+            );
+            CREATE TABLE IF NOT EXISTS task_tags (
+                task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+                tag TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_position ON tasks(position);
+            CREATE INDEX IF NOT EXISTS idx_task_tags_task ON task_tags(task_id);
+        """)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+
+    def load(self):
+        tags = {}
+        with self.lock:
+            for task_id, tag in self.conn.execute("SELECT task_id, tag FROM task_tags ORDER BY rowid"):
+                tags.setdefault(task_id, []).append(tag)
+            rows = self.conn.execute(f"SELECT {', '.join(self.COLUMNS)}, extra FROM tasks ORDER BY position").fetchall()
+        tasks = []
+        for row in rows:
+            task = dict(zip(self.COLUMNS, row))
+            task["completed"] = bool(task["completed"])
+            if task["due_date"] is None:
+                task["due_date"] = "No due date"
+            task["tags"] = tags.get(task["id"], [])
+            task.update(json.loads(row[-1] or "{}"))
+            tasks.append(task)
+        return tasks
+
+    def save(self, tasks, changes=None):
+        """Write the changes (or everything); returns an estimate of the bytes of row data written"""
+        written = 0
+        with self.lock, self.conn:
+            if changes is None:
+                self.conn.execute("DELETE FROM task_tags")
+                self.conn.execute("DELETE FROM tasks")
+                changes = [("put", task) for task in task_list(tasks)]
+            for op, task in changes:
+                self.conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task["id"],))
+                if op == "delete":
+                    self.conn.execute("DELETE FROM tasks WHERE id = ?", (task["id"],))
+                    written += len(task["id"])
+                else:
+                    written += self._put(task)
+        return written
+
+    def _put(self, task):
+        extra = {k: v for k, v in task.items() if k not in self.COLUMNS and k != "tags"}
+        due_date = task["due_date"] if task["due_date"] != "No due date" else None
+        row = (task["id"], task["task"], int(task["completed"]), task["category"], task["priority"], due_date,
+               task.get("created_at"), task.get("notes", ""), json.dumps(extra))
+        self.conn.execute("""
+            INSERT INTO tasks (id, position, task, completed, category, priority,
+                               due_date, created_at, notes, extra)
+            VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM tasks), ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                task = excluded.task, completed = excluded.completed, category = excluded.category,
+                priority = excluded.priority, due_date = excluded.due_date, created_at = excluded.created_at,
+                notes = excluded.notes, extra = excluded.extra
+        """, row)
+        tags = [(task["id"], tag) for tag in task.get("tags", [])]
+        self.conn.executemany("INSERT INTO task_tags (task_id, tag) VALUES (?, ?)", tags)
+        # Rough size of the row and its tag rows (text as UTF-8, numbers as 8 bytes)
+        size = sum(len(value.encode("utf-8")) if isinstance(value, str) else 8 for value in row)
+        return size + sum(len(task_id) + len(tag.encode("utf-8")) for task_id, tag in tags)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_storage(path="tasks.json"):
+    """Pick the storage engine from the file extension"""
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SqliteStorage(path)
+    return JournalStorage(path)
+
+
+def read_csv_tasks(path):
+    with open(path, "r", newline="") as f:
+        return [task_from_csv_row(row) for row in csv.DictReader(f)]
+
+
+def migrate_to_sqlite(source, db_path):
+    """One-shot copy of a tasks.json (plus journal) or an exported CSV into a SQLite store"""
+    if source.lower().endswith(".csv"):
+        tasks = read_csv_tasks(source)
+    else:
+        tasks = JournalStorage(source).load()
+    storage = SqliteStorage(db_path)
+    try:
+        storage.save(tasks)
+    finally:
+        storage.close()
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python storage.py <tasks.json|export.csv> <tasks.db>")
+        sys.exit(1)
+    count = migrate_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"Migrated {count} tasks to {sys.argv[2]}")
@@ -0,0 +1,445 @@
+import argparse
+import gzip
+import json
+import os
+import queue
+import threading
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from perf import timed
+from storage import atomic_write
+from task_model import MISSING, Task
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+PAGE_SIZE = 2000
+BASE = [0, ""]  # Stamp of a field nobody has changed since syncing started
+
+
+def _wins(value, current):
+    # Tie-break for equal stamps (two machines starting from different copies), the same everywhere
+    return json.dumps(value, sort_keys=True) > json.dumps(current, sort_keys=True)
+
+
+def merge_fields(fields, stamps, record):
+    """Per-field last-writer-wins merge of a sync record into one task's state.
+
+    ``fields`` are the task's current values (None for a task not seen
+    yet) and ``stamps`` its ``{field: [lamport clock, replica]}``, which
+    is updated in place.  Returns the fields whose incoming value won.  A
+    deletion wins over any edit, so a deleted task stays a tombstone.
+    """
+    if fields is not None and fields.get("deleted"):
+        return {}
+    changes = {}
+    incoming = record.get("stamps", {})
+    for field, value in record["fields"].items():
+        stamp = incoming.get(field, BASE)
+        mine = stamps.get(field, BASE)
+        if fields is None or field not in fields or stamp > mine or (
+                stamp == mine and value != fields[field] and _wins(value, fields[field])):
+            if stamp != BASE:
+                stamps[field] = stamp
+            changes[field] = value
+    if changes.get("deleted"):
+        return {"deleted": True}
+    return changes
+
+
+def _post(url, payload, timeout=30):
+    # One gzipped JSON round trip; returns (response, bytes sent, bytes received)
+    body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), compresslevel=5)
+    request = urllib.request.Request(url.rstrip("/") + "/sync", data=body, headers={
+        "Content-Type": "application/json", "Content-Encoding": "gzip", "Accept-Encoding": "gzip"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        data = response.read()
+        received = len(data)
+        if response.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+    return json.loads(data), len(body), received
+
+
+class SyncState:
+    """The server's copy of a task list: merged fields, stamps and a change log.
+
+    ``order`` maps each task id to the sequence number of its last change
+    and is kept in that order (a changed task is moved to the end), so
+    the changes after a client's cursor are found by walking back from
+    the end, in time proportional to the delta rather than the list.
+    Deleted tasks stay as tombstones so late edits can't bring them back.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tasks = {}   # id -> fields
+        self.stamps = {}  # id -> {field: stamp}, non-BASE stamps only
+        self.order = {}   # id -> sequence number, oldest change first
+        self.seq = 0
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.tasks, self.stamps, self.order, self.seq = data["tasks"], data["stamps"], data["order"], data["seq"]
+
+    def save(self):
+        if self.path:
+            with self.lock:
+                data = json.dumps({"seq": self.seq, "tasks": self.tasks, "stamps": self.stamps, "order": self.order})
+            atomic_write(self.path, data.encode("utf-8"))
+
+    def record(self, task_id):
+        # Stamps are merged in place, so copy them before the lock is released
+        return {"id": task_id, "fields": self.tasks[task_id], "stamps": dict(self.stamps.get(task_id, {}))}
+
+    def changes_since(self, cursor):
+        ids = []
+        for task_id in reversed(self.order):
+            if self.order[task_id] <= cursor:
+                break
+            ids.append(task_id)
+        ids.reverse()
+        return ids
+
+    def apply(self, records):
+        for record in records:
+            task_id = record["id"]
+            current = self.tasks.get(task_id)
+            stamps = self.stamps.get(task_id, {})
+            changes = merge_fields(current, stamps, record)
+            if not changes:
+                continue
+            if changes.get("deleted"):
+                self.tasks[task_id] = {"deleted": True}
+            else:
+                self.tasks[task_id] = dict(current or {}, **changes)
+            if stamps:
+                self.stamps[task_id] = stamps
+            self.seq += 1
+            self.order.pop(task_id, None)
+            self.order[task_id] = self.seq
+
+    def handle(self, request):
+        """One sync round: the changes after the client's cursor, then the client's own changes.
+
+        The client's changes are only applied once it has seen everything
+        before them (``more`` is false), so the new cursor can skip them.
+        """
+        limit = request.get("limit", PAGE_SIZE)
+        with self.lock:
+            ids = self.changes_since(request.get("cursor", 0))
+            more = len(ids) > limit
+            ids = ids[:limit]
+            changes = [self.record(task_id) for task_id in ids]
+            if more:
+                return {"changes": changes, "cursor": self.order[ids[-1]], "accepted": False, "more": True}
+            self.apply(request.get("changes", ()))
+            return {"changes": changes, "cursor": self.seq, "accepted": True, "more": False}
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/sync":
+            self.send_error(404)
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            response = self.server.state.handle(json.loads(body))
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            self.send_error(400, str(e))
+            return
+        data = gzip.compress(json.dumps(response, separators=(",", ":")).encode("utf-8"), compresslevel=5)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyncServer(ThreadingHTTPServer):
+    """A small local sync server, standing in for a shared one (tests, benchmarks, a home network)"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8765, path=None):
+        super().__init__((host, port), SyncHandler)
+        self.state = SyncState(path)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve from a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.state.save()
+
+
+def task_record(task_id, task, stamps):
+    """The record pushed for a task (None if it has been deleted)"""
+    fields = {"deleted": True} if task is None else {key: value for key, value in task.items() if key != "id"}
+    return {"id": task_id, "fields": fields, "stamps": dict(stamps.get(task_id, {}))}
+
+
+class SyncWorker(threading.Thread):
+    """Pushes a client's changes and pulls everyone else's on a worker thread.
+
+    Puts ``("changes", records)`` on ``self.queue`` for each page pulled,
+    then ``("done", cursor, stats)`` or ``("error", message)``.  Merging
+    the pulled records is left to the Tk thread.  For a full push, pass
+    the collection and a copy of the stamps: the records of every task are
+    built here from a snapshot() rather than on the Tk thread.
+    """
+
+    def __init__(self, url, cursor, outgoing, batch_size=PAGE_SIZE, tasks=None, stamps=None):
+        super().__init__()
+        self.daemon = True
+        self.url = url
+        self.cursor = cursor
+        self.outgoing = outgoing
+        self.batch_size = batch_size
+        self.tasks = tasks
+        self.stamps = stamps
+        self.queue = queue.Queue()
+
+    @timed("sync")
+    def run(self):
+        stats = {"sent": 0, "received": 0, "bytes sent": 0, "bytes received": 0, "requests": 0}
+        cursor, outgoing = self.cursor, self.outgoing
+        if self.tasks is not None:
+            # The snapshot may be newer than the stamps, never older, so a field is never
+            # pushed with the stamp of a change it doesn't have yet
+            outgoing = [task_record(task["id"], task, self.stamps) for task in self.tasks.snapshot()] + outgoing
+        try:
+            while True:
+                batch = outgoing[:self.batch_size]
+                response, sent, received = _post(self.url, {"cursor": cursor, "changes": batch,
+                                                            "limit": self.batch_size})
+                stats["requests"] += 1
+                stats["bytes sent"] += sent
+                stats["bytes received"] += received
+                if response["changes"]:
+                    stats["received"] += len(response["changes"])
+                    self.queue.put(("changes", response["changes"]))
+                cursor = response["cursor"]
+                if response["accepted"]:
+                    stats["sent"] += len(batch)
+                    outgoing = outgoing[self.batch_size:]
+                if not outgoing and not response["more"]:
+                    break
+            self.queue.put(("done", cursor, stats))
+        except (OSError, KeyError, ValueError) as e:
+            self.queue.put(("error", str(e)))
+
+
+class SyncClient:
+    """Keeps a TaskStore in sync with a SyncServer by exchanging deltas.
+
+    Every local change stamps the changed fields with a Lamport clock and
+    this replica's id and marks the task as pending; a sync pushes just
+    the pending tasks and pulls the tasks changed on the server since the
+    last sync (the server's sequence number is the cursor).  Conflicts
+    are settled per field, the later stamp winning, so edits of different
+    fields on two machines both survive.  The network runs on a
+    SyncWorker thread; start() and poll() are called from the Tk thread,
+    which merges what arrives.  The clock, cursor, stamps and pending ids
+    live in a ``<task file>.sync`` file next to the list.
+    """
+
+    def __init__(self, store, url=None, state_path=None, batch_size=PAGE_SIZE):
+        self.store = store
+        self.batch_size = batch_size
+        self.tasks = store.tasks
+        self.state_path = state_path or f"{store.storage.path}.sync"
+        state = self.read_state(self.state_path) or {}
+        self.replica = state.get("replica") or uuid.uuid4().hex
+        self.url = url or state.get("url") or DEFAULT_URL
+        self.clock = state.get("clock", 0)
+        self.cursor = state.get("cursor", 0)
+        self.stamps = state.get("stamps", {})
+        self.pending = state.get("pending", {})  # task id -> clock of its last local change
+        # Until the first sync has gone through, everything is pushed
+        self.full_push = not state.get("synced")
+        self.worker = None
+        self.sent = None
+        self.applying = False
+        self.tasks.subscribe(self.on_tasks_changed)
+
+    @staticmethod
+    def read_state(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def configured(cls, store):
+        """Whether the store's list has been synced before"""
+        return os.path.exists(f"{store.storage.path}.sync")
+
+    def save_state(self):
+        data = json.dumps({"replica": self.replica, "url": self.url, "clock": self.clock,
+                           "cursor": self.cursor, "synced": not self.full_push,
+                           "stamps": self.stamps, "pending": self.pending})
+        atomic_write(self.state_path, data.encode("utf-8"), fsync=False)
+
+    def close(self):
+        self.tasks.unsubscribe(self.on_tasks_changed)
+        self.save_state()
+
+    def on_tasks_changed(self, event, task, old):
+        if self.applying or event == "batch":
+            return
+        if event == "reset":
+            self.full_push = True
+            return
+        if event == "added":
+            fields = [key for key in task.keys() if key != "id"]
+        elif event == "changed":
+            # The edit dialog passes every field; stamping the unchanged ones would let this edit
+            # overwrite other machines' edits of them
+            fields = [key for key, value in old.items() if value != task.get(key, MISSING)]
+            if not fields:
+                return
+        else:
+            fields = ("deleted",)
+        self.clock += 1
+        stamp = [self.clock, self.replica]
+        # Replaced rather than updated in place, so a copy of self.stamps taken by start() stays as it was
+        self.stamps[task["id"]] = dict(self.stamps.get(task["id"], {}), **{field: stamp for field in fields})
+        self.pending[task["id"]] = self.clock
+
+    def record(self, task_id):
+        return task_record(task_id, self.tasks.get(task_id), self.stamps)
+
+    @property
+    def running(self):
+        return self.worker is not None
+
+    def start(self):
+        """Start a sync in the background; False if one is already running"""
+        if self.worker is not None:
+            return False
+        self.sent = (dict(self.pending), self.full_push)
+        if self.full_push:
+            # Only the deletions are sent from here; the worker adds every task in the list
+            deleted = [self.record(task_id) for task_id in self.pending if task_id not in self.tasks]
+            self.worker = SyncWorker(self.url, self.cursor, deleted, self.batch_size,
+                                     tasks=self.tasks, stamps=dict(self.stamps))
+        else:
+            self.worker = SyncWorker(self.url, self.cursor, [self.record(task_id) for task_id in self.pending],
+                                     self.batch_size)
+        self.worker.start()
+        return True
+
+    def poll(self, block=False):
+        """Merge what the worker has pulled so far, one page per call.
+
+        Returns None while the sync is running, then ``("done", stats)``
+        or ``("error", message)``.
+        """
+        if self.worker is None:
+            return None
+        try:
+            message = self.worker.queue.get(block)
+        except queue.Empty:
+            return None
+        if message[0] == "changes":
+            self.apply(message[1])
+            return None
+        self.worker = None
+        if message[0] == "error":
+            return message
+        _, self.cursor, stats = message
+        pending, full_push = self.sent
+        for task_id, clock in pending.items():
+            # Changed again while the sync was running: push that next time
+            if self.pending.get(task_id) == clock:
+                del self.pending[task_id]
+        if full_push:
+            self.full_push = False
+        self.save_state()
+        return ("done", stats)
+
+    def sync(self):
+        """Run a whole sync and wait for it (no Tk loop needed)"""
+        self.start()
+        while True:
+            result = self.poll(block=True)
+            if result is not None:
+                return result
+
+    @timed("sync merge")
+    def apply(self, records):
+        """Merge pulled records into the list, as one save and one refresh"""
+        self.applying = True
+        try:
+            with self.tasks.transaction() as log:
+                for record in records:
+                    self._apply(record)
+        finally:
+            self.applying = False
+        if log:
+            self.store.save(self.store.changes_for(log))
+
+    def _apply(self, record):
+        task_id = record["id"]
+        task = self.tasks.get(task_id)
+        stamps = dict(self.stamps.get(task_id, {}))  # merge_fields updates it in place
+        if task is not None:
+            current = {key: value for key, value in task.items() if key != "id"}
+        elif "deleted" in stamps:
+            current = {"deleted": True}
+        else:
+            current = None
+        for stamp in record.get("stamps", {}).values():
+            self.clock = max(self.clock, stamp[0])
+        changes = merge_fields(current, stamps, record)
+        if stamps:
+            self.stamps[task_id] = stamps
+        if not changes:
+            return
+        if changes.get("deleted"):
+            if task is not None:
+                self.tasks.remove(task_id)
+        elif task is None:
+            self.tasks.add(Task.from_dict(dict(changes, id=task_id)))
+        else:
+            self.tasks.update(task_id, **changes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local task sync server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", default="sync_server.json", help="where the server keeps the synced tasks")
+    args = parser.parse_args(argv)
+    server = SyncServer(args.host, args.port, args.data)
+    print(f"Serving task sync on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.state.save()
+
+
+if __name__ == "__main__":
+    main()
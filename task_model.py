@@ -0,0 +1,442 @@
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+NO_DUE_DATE = "No due date"
+MISSING = object()
+
+# Category and priority names are interned as small ints shared by all tasks
+_names = []
+_name_codes = {}
+_names_lock = threading.Lock()  # Tasks are built on the loader and importer threads too
+_tag_tuples = {}
+
+
+def intern_name(name):
+    code = _name_codes.get(name)
+    if code is None:
+        with _names_lock:
+            code = _name_codes.get(name)
+            if code is None:
+                code = len(_names)
+                _names.append(name)
+                _name_codes[name] = code
+    return code
+
+
+def intern_tags(tags):
+    tags = tuple(sys.intern(tag) for tag in tags or ())
+    return _tag_tuples.setdefault(tags, tags)
+
+
+def _pack_date(value):
+    # Ordinal day number; 0 is "No due date" and anything but an exact YYYY-MM-DD is kept verbatim
+    # (fromisoformat also takes "20240105" or "2024-W01-5", which wouldn't come back the same)
+    if value == NO_DUE_DATE:
+        return 0
+    if not (isinstance(value, str) and len(value) == 10 and value[4] == "-" and value[7] == "-"):
+        return value
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return value
+
+
+def _unpack_date(value):
+    if value == 0:
+        return NO_DUE_DATE
+    if isinstance(value, int):
+        return date.fromordinal(value).isoformat()
+    return value
+
+
+def _pack_timestamp(value):
+    # "YYYY-MM-DD HH:MM:SS" as seconds since day 1 (naive, so no DST surprises); only exact matches,
+    # so anything else comes back verbatim
+    if not (isinstance(value, str) and len(value) == 19 and value[10] == " " and value[13] == ":" and value[16] == ":"):
+        return value
+    day = _pack_date(value[:10])
+    hours, minutes, seconds = value[11:13], value[14:16], value[17:19]
+    if not (isinstance(day, int) and day and hours.isdigit() and minutes.isdigit() and seconds.isdigit()):
+        return value
+    if int(hours) > 23 or int(minutes) > 59 or int(seconds) > 59:
+        return value
+    return day * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _unpack_timestamp(value):
+    if not isinstance(value, int):
+        return value
+    day, seconds = divmod(value, 86400)
+    return f"{date.fromordinal(day).isoformat()} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Task:
+    """Compact replacement for a task dict.
+
+    Category and priority are interned small ints, dates are ordinal
+    ints, tags are interned tuples and dependencies plain tuples (they are
+    unique per task, so interning them would only keep them alive), and
+    fields outside the usual schema go to a small extra dict.  Tasks still behave like a
+    read/write mapping with the tasks.json keys (task["due_date"],
+    task.get("tags"), dict(task)...), and to_dict()/from_dict() round-trip
+    losslessly, missing optional keys included.
+    """
+
+    __slots__ = ("id", "text", "completed", "_category", "_priority", "_due", "_created",
+                 "_notes", "_tags", "_dependencies", "_extra")
+
+    KEYS = ("id", "task", "completed", "category", "priority", "due_date", "created_at",
+            "notes", "tags", "dependencies")
+    OPTIONAL = {"created_at": "_created", "notes": "_notes", "tags": "_tags", "dependencies": "_dependencies"}
+
+    def __init__(self, data=None, **fields):
+        self._extra = None
+        self._created = self._notes = self._tags = self._dependencies = MISSING
+        self.update(data or {}, **fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        return data if isinstance(data, cls) else cls(data)
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def copy(self):
+        clone = Task.__new__(Task)
+        for slot in self.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        if self._extra is not None:
+            clone._extra = dict(self._extra)
+        return clone
+
+    def keys(self):
+        keys = [key for key in self.KEYS if key in self]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def __contains__(self, key):
+        if key in ("id", "task", "completed", "category", "priority", "due_date"):
+            return True
+        slot = self.OPTIONAL.get(key)
+        if slot is not None:
+            return getattr(self, slot) is not MISSING
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __getitem__(self, key):
+        if key == "task":
+            return self.text
+        if key == "completed":
+            return self.completed
+        if key == "id":
+            return self.id
+        if key == "priority":
+            return _names[self._priority]
+        if key == "category":
+            return _names[self._category]
+        if key == "due_date":
+            return _unpack_date(self._due)
+        if key == "tags" or key == "dependencies":
+            value = self._tags if key == "tags" else self._dependencies
+            if value is MISSING:
+                raise KeyError(key)
+            return list(value)
+        if key == "notes":
+            if self._notes is MISSING:
+                raise KeyError(key)
+            return self._notes
+        if key == "created_at":
+            if self._created is MISSING:
+                raise KeyError(key)
+            return _unpack_timestamp(self._created)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "task":
+            self.text = value
+        elif key == "completed":
+            self.completed = value
+        elif key == "id":
+            self.id = value
+        elif key == "priority":
+            self._priority = intern_name(value)
+        elif key == "category":
+            self._category = intern_name(value)
+        elif key == "due_date":
+            self._due = _pack_date(value)
+        elif key == "created_at":
+            self._created = _pack_timestamp(value)
+        elif key == "notes":
+            self._notes = value
+        elif key == "tags":
+            self._tags = intern_tags(value)
+        elif key == "dependencies":
+            self._dependencies = tuple(value or ())
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        # Only optional and extra keys can be missing
+        slot = self.OPTIONAL.get(key)
+        if slot is not None and getattr(self, slot) is not MISSING:
+            setattr(self, slot, MISSING)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+        else:
+            raise KeyError(key)
+
+    def update(self, data=(), **fields):
+        for key, value in dict(data, **fields).items():
+            self[key] = value
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+
+def as_dict(task):
+    """Plain dict for JSON; tasks may be Task objects or dicts"""
+    return task.to_dict() if isinstance(task, Task) else task
+
+
+def previous_fields(task, old):
+    """The fields a task had before a "changed" event, from the old values given to listeners"""
+    fields = dict(task)
+    for key, value in old.items():
+        if value is MISSING:
+            fields.pop(key, None)
+        else:
+            fields[key] = value
+    return fields
+
+
+class TaskCollection:
+    """The list of tasks plus an id index and change notifications.
+
+    Every mutation goes through add/remove/update/reset so listeners can
+    react to just the task that changed.  Listeners are called as
+    ``listener(event, task, old)`` where event is "added", "removed",
+    "changed" (old holds the previous values of the changed fields, MISSING
+    for those the task didn't have; see previous_fields()), "reset" (task
+    is None) or "batch" (sent when a batch() block ends).
+
+    Mutations (and the listener calls they trigger) run under a single
+    writer lock.  The live tasks belong to the writer thread (the Tk main
+    loop); other threads such as the reminder, autosave or export workers
+    should call snapshot(), which returns an immutable, consistent copy
+    that is rebuilt at most once per change.  Field values are replaced,
+    never mutated in place, so the shallow copies stay consistent.
+    """
+
+    def __init__(self, tasks=()):
+        self._tasks = list(tasks)
+        self._by_id = {task["id"]: task for task in self._tasks}
+        self._listeners = []
+        self._snapshot = None
+        self.lock = threading.RLock()
+        self.version = 0
+        self.batching = 0
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _notify(self, event, task, old=None):
+        self.version += 1
+        self._snapshot = None
+        for listener in self._listeners:
+            listener(event, task, old)
+
+    @contextmanager
+    def batch(self):
+        """Group many mutations; listeners can check ``batching`` to defer expensive work"""
+        with self.lock:
+            self.batching += 1
+            try:
+                yield self
+            finally:
+                self.batching -= 1
+                if not self.batching:
+                    self._notify("batch", None)
+
+    def _recorder(self, log):
+        # Listener that appends the inverse of each mutation to an undo log
+        def record(event, task, old):
+            if event == "added":
+                log.append(("remove", task["id"], None))
+            elif event == "removed":
+                log.append(("add", task, None))
+            elif event == "changed":
+                log.append(("update", task["id"], old))
+        return record
+
+    @contextmanager
+    def recording(self):
+        """Yield the undo log of the mutations made in the block, like transaction() but without a batch"""
+        log = []
+        record = self._recorder(log)
+        self._listeners.insert(0, record)
+        try:
+            yield log
+        finally:
+            self.unsubscribe(record)
+
+    @contextmanager
+    def transaction(self):
+        """A batch() that records how to undo itself, and rolls back if the block raises.
+
+        Yields the undo log, a list of ``(op, target, old)`` steps that
+        revert() replays backwards.
+        """
+        log = []
+        record = self._recorder(log)
+        with self.batch():
+            self._listeners.insert(0, record)
+            try:
+                yield log
+            except BaseException:
+                self.unsubscribe(record)
+                self.revert(log)
+                raise
+            finally:
+                if record in self._listeners:
+                    self.unsubscribe(record)
+
+    def revert(self, log):
+        """Undo a transaction log; returns the log that redoes it.
+
+        Runs of added tasks are removed in a single pass over the list, so
+        undoing a large import doesn't scan the list once per task.
+        """
+        with self.transaction() as inverse:
+            removals = []
+            for op, target, old in reversed(log):
+                if op == "remove":
+                    removals.append(target)
+                    continue
+                self._remove_all(removals)
+                removals = []
+                if op == "add":
+                    self.add(target)
+                else:
+                    self.update(target, **old)
+            self._remove_all(removals)
+        return inverse
+
+    def _remove_all(self, task_ids):
+        for task_id in task_ids:
+            if task_id not in self._by_id:
+                raise KeyError(task_id)
+        if len(task_ids) == 1:
+            self.remove(task_ids[0])
+        elif task_ids:
+            self.remove_many(task_ids)
+
+    def snapshot(self):
+        """A consistent tuple of task copies that is safe to read from any thread"""
+        # Copied outside the lock so the writer isn't held up, and kept only if nothing changed
+        # meanwhile; a reader that keeps losing that race copies under the lock
+        for _ in range(3):
+            with self.lock:
+                if self._snapshot is not None:
+                    return self._snapshot
+                tasks, version = self._tasks, self.version
+            snapshot = tuple(task.copy() for task in tasks)
+            with self.lock:
+                if self.version == version:
+                    self._snapshot = snapshot
+                    return snapshot
+        with self.lock:
+            if self._snapshot is None:
+                self._snapshot = tuple(task.copy() for task in self._tasks)
+            return self._snapshot
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __getitem__(self, index):
+        return self._tasks[index]
+
+    def __contains__(self, task_id):
+        return task_id in self._by_id
+
+    def get(self, task_id):
+        return self._by_id.get(task_id)
+
+    def add(self, task):
+        with self.lock:
+            self._tasks.append(task)
+            self._by_id[task["id"]] = task
+            self._notify("added", task)
+        return task
+
+    def extend(self, tasks):
+        with self.batch():
+            for task in tasks:
+                self.add(task)
+
+    def remove(self, task_id):
+        with self.lock:
+            task = self._by_id.pop(task_id)
+            for index, candidate in enumerate(self._tasks):
+                if candidate is task:
+                    del self._tasks[index]
+                    break
+            self._notify("removed", task)
+        return task
+
+    def remove_many(self, task_ids):
+        """Remove several tasks with a single pass over the list"""
+        with self.batch():
+            removed = [self._by_id.pop(task_id) for task_id in task_ids if task_id in self._by_id]
+            doomed = {id(task) for task in removed}
+            self._tasks = [task for task in self._tasks if id(task) not in doomed]
+            for task in removed:
+                self._notify("removed", task)
+        return removed
+
+    def update(self, task_id, **fields):
+        """Change some fields of a task; a field given as MISSING is removed (revert() does that)"""
+        with self.lock:
+            task = self._by_id[task_id]
+            old = {key: task.get(key, MISSING) for key in fields}
+            for key, value in fields.items():
+                if value is not MISSING:
+                    task[key] = value
+                elif key in task:
+                    del task[key]
+            self._notify("changed", task, old)
+        return task
+
+    def reset(self, tasks):
+        with self.lock:
+            self._tasks = list(tasks)
+            self._by_id = {task["id"]: task for task in self._tasks}
+            self._notify("reset", None)
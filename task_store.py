@@ -0,0 +1,408 @@
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from autosave import Autosave
+from dependency_graph import DependencyGraph
+from history import UndoHistory
+from import_export import CsvImporter, TaskExporter, export_tasks
+from perf import timed
+from recurrence import first_occurrence, next_occurrence, upcoming
+from reminders import REMINDER_FORMAT, ReminderScheduler
+from search_index import SearchIndex
+from sorted_views import SORT_KEYS, SortedViews
+from stats import TaskStats
+from storage import JournalStorage, batched, migrate_dependencies, new_task_id
+from task_model import NO_DUE_DATE, Task, TaskCollection
+
+
+class TaskLoader(threading.Thread):
+    """Reads the storage on a worker thread and hands the tasks over in batches.
+
+    Puts ``("batch", tasks)`` on ``self.queue`` as the file is parsed, the
+    first one only a screenful so it can be shown right away, then
+    ``("done",)`` or ``("error", message)``.  Storages without
+    load_batches() are loaded in one go.
+    """
+
+    FIRST_BATCH = 100
+
+    def __init__(self, storage, batch_size=5000):
+        super().__init__()
+        self.daemon = True
+        self.storage = storage
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+
+    def _tasks(self):
+        if hasattr(self.storage, "load_batches"):
+            for batch in self.storage.load_batches(self.batch_size):
+                yield from batch
+        else:
+            yield from self.storage.load()
+
+    def run(self):
+        try:
+            tasks = (Task.from_dict(task) for task in self._tasks())
+            first = []
+            for task in tasks:
+                first.append(task)
+                if len(first) >= self.FIRST_BATCH:
+                    break
+            self.queue.put(("batch", first))
+            for batch in batched(tasks, self.batch_size):
+                self.queue.put(("batch", batch))
+            self.queue.put(("done",))
+        except Exception as e:
+            self.queue.put(("error", str(e)))
+
+
+class TaskStore:
+    """The task list and everything done to it, without any UI.
+
+    Owns the TaskCollection and the indexes that follow it (search, stats,
+    sorted views, dependency graph, reminders) plus the storage and its
+    autosave thread.  Every operation of the app is a plain method here,
+    identified by task ids, so it can be scripted, benchmarked or tested
+    without a display; TodoApp only turns widget input into these calls
+    and draws the result.  Invalid input raises ValueError with a message
+    meant for the user.
+
+    Nothing is written until start() runs the autosave thread (or flush()
+    / close() is called), so a script can make many changes and write them
+    once.
+    """
+
+    CATEGORIES = ["Work", "Personal", "Shopping", "Health", "Other"]
+    PRIORITIES = ["High", "Medium", "Low"]
+    FILTERS = ("all", "active", "completed", "ready", "blocked")
+    GRAPH_FILTERS = ("ready", "blocked")
+
+    def __init__(self, storage=None, on_reminder=None, autosave_delay=0.5, undo_steps=100, undo_ops=1_000_000):
+        self.tasks = TaskCollection()
+        self.search_index = SearchIndex(self.tasks)
+        self.stats = TaskStats(self.tasks)
+        self.sorted_views = SortedViews(self.tasks)
+        self.dependency_graph = DependencyGraph(self.tasks)
+        self.reminders = ReminderScheduler(self.tasks, on_reminder or (lambda task_id, kind: None))
+        self.storage = storage if storage is not None else JournalStorage("tasks.json")
+        self.autosave = Autosave(self.tasks, self.storage, delay=autosave_delay)
+        # Every change below is one undo step; loading a list starts a new history
+        self.history = UndoHistory(self.tasks, undo_steps, undo_ops)
+        self.loading = False
+
+    def start(self, reminders=True):
+        self.autosave.start()
+        if reminders:
+            self.reminders.start()
+
+    def close(self):
+        self.autosave.stop()
+        self.reminders.stop()
+        self.storage.close()
+
+    @timed("load")
+    def load(self):
+        self.tasks.reset(Task.from_dict(task) for task in self.storage.load())
+        self.history.clear()
+        self._save_upgrade()
+
+    def _save_upgrade(self):
+        # Ids given to tasks from an older file are new on every load until the whole list is written
+        if getattr(self.storage, "upgraded", False):
+            self.save()
+
+    def loader(self, batch_size=5000):
+        """A TaskLoader for a progressive load (not started yet); pass its batches to add_loaded().
+
+        Don't start() the store until finish_loading(): saving a partly
+        loaded list would lose the rest.
+        """
+        self.loading = True
+        return TaskLoader(self.storage, batch_size)
+
+    @timed("load batch")
+    def add_loaded(self, batch):
+        if not self.tasks:
+            # Building the indexes in one go is cheaper than a batch of inserts
+            self.tasks.reset(batch)
+            self.history.clear()
+        else:
+            self.tasks.extend(batch)
+
+    def finish_loading(self):
+        self.loading = False
+        self._save_upgrade()
+        # Files from before task ids numbered dependencies by position, which needs the whole list;
+        # the graph has already collected every dependency that doesn't name a task
+        waiting = {task_id for task_ids in self.dependency_graph.waiting.values() for task_id in task_ids}
+        if not waiting:
+            return
+        with self.tasks.batch():
+            for task_id in waiting:
+                dependencies = self.tasks.get(task_id)["dependencies"]
+                self.tasks.update(task_id, dependencies=migrate_dependencies(dependencies, self.tasks, self.tasks))
+        # Positions shift as tasks are deleted, so the numbers must not be migrated again next time
+        self.save([("put", self.tasks.get(task_id)) for task_id in waiting])
+
+    def load_all(self, loader):
+        """Commit whatever a started TaskLoader still has to deliver and wait for it"""
+        while True:
+            message = loader.queue.get()
+            if message[0] == "batch":
+                self.add_loaded(message[1])
+            elif message[0] == "error":
+                self.loading = False
+                raise ValueError(f"Error loading tasks: {message[1]}")
+            else:
+                self.finish_loading()
+                return
+
+    def save(self, changes=None):
+        """Hand changes (``[(op, task)]``, or None for everything) to the autosave thread"""
+        self.autosave.mark(changes)
+
+    def flush(self):
+        return self.autosave.flush()
+
+    def get(self, task_id):
+        return self.tasks.get(task_id)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def _task(self, task_id):
+        task = self.tasks.get(task_id)
+        if task is None:
+            raise KeyError(task_id)
+        return task
+
+    # Queries
+
+    def matches_filter(self, task, status):
+        if status == "active":
+            return not task["completed"]
+        if status == "completed":
+            return task["completed"]
+        if status == "ready":
+            return self.dependency_graph.is_ready(task["id"])
+        if status == "blocked":
+            return self.dependency_graph.is_blocked(task["id"])
+        return True
+
+    def matches(self, task, status="all", search=""):
+        """Whether a single task belongs in query(status, search)"""
+        if not self.matches_filter(task, status):
+            return False
+        return not search or self.search_index.matches(task["id"], search)
+
+    @timed("query")
+    def query(self, status="all", search="", sort="priority"):
+        """Ids of the matching tasks in display order (a new list the caller may keep)"""
+        search = search.lower()
+        # Answered from memory whatever the storage, so a query never waits for a save. The sorted
+        # view for this mode is maintained as tasks change, so nothing is re-sorted here;
+        # search results (found through the index) are ordered by their precomputed sort keys
+        if search:
+            task_ids = self.sorted_views.sort(sort, self.search_index.search(search))
+        else:
+            task_ids = self.sorted_views.ids(sort)
+        if status == "all":
+            return list(task_ids)
+        return [task_id for task_id in task_ids if self.matches_filter(self.tasks.get(task_id), status)]
+
+    def upcoming(self, first, last):
+        """``(date, task)`` for each occurrence of a repeating task between two dates, generated lazily"""
+        return upcoming(self.tasks, first, last)
+
+    @staticmethod
+    def sort_key(sort):
+        return SORT_KEYS.get(sort)
+
+    # Single-task changes
+
+    def new_task(self, text, category="Other", priority="Medium", due_date=NO_DUE_DATE, **fields):
+        """A task with a fresh id and the usual defaults, not added yet"""
+        text = text.strip()
+        if not text:
+            raise ValueError("Please enter a task!")
+        return Task({
+            "id": new_task_id(),
+            "task": text,
+            "completed": False,
+            "category": category,
+            "priority": priority,
+            "due_date": due_date,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "notes": "",
+            "tags": [],
+            "dependencies": [],
+            **fields
+        })
+
+    def add(self, text, category="Other", priority="Medium", due_date=NO_DUE_DATE, **fields):
+        task = self.new_task(text, category, priority, due_date, **fields)
+        with self.step("Add"):
+            self.tasks.add(task)
+        self.save([("put", task)])
+        return task
+
+    def edit(self, task_id, **fields):
+        task = self._task(task_id)
+        for reminder in fields.get("reminders") or ():
+            try:
+                datetime.strptime(reminder, REMINDER_FORMAT)
+            except ValueError:
+                raise ValueError("Reminders must look like 2024-05-31 09:00")
+        if "dependencies" in fields:
+            self.dependency_graph.check(task_id, fields["dependencies"])
+        if fields.get("recurrence"):
+            # A repeating task is always due at one of its occurrences, never on a day the rule skips
+            due_date = fields.get("due_date", task["due_date"])
+            due_date = first_occurrence(fields["recurrence"], due_date if due_date != NO_DUE_DATE else None)
+            if due_date is None:
+                raise ValueError("The repeat has no dates left!")
+            fields["due_date"] = due_date
+        with self.step("Edit"):
+            self.tasks.update(task_id, **fields)
+        self.save([("put", task)])
+        return task
+
+    def complete(self, task_id, completed=None):
+        """Mark a task done (or not); toggles when completed is None.
+
+        Completing a repeating task moves its due date to the next
+        occurrence instead, until the series is over.
+        """
+        task = self._task(task_id)
+        with self.step("Complete"):
+            self.tasks.update(task_id, **self._completion(task, not task["completed"] if completed is None else completed))
+        self.save([("put", task)])
+        return task
+
+    def _completion(self, task, completed):
+        if completed and not task["completed"] and task.get("recurrence"):
+            due_date = next_occurrence(task["recurrence"], task["due_date"])
+            if due_date is not None:
+                return {"due_date": due_date}
+        return {"completed": completed}
+
+    def delete(self, task_id):
+        with self.step("Delete"):
+            task = self.tasks.remove(task_id)
+        self.save([("delete", task)])
+        return task
+
+    @contextmanager
+    def step(self, label, group=None):
+        """Record the changes made in the block as one undo step"""
+        with self.tasks.recording() as log:
+            yield log
+        self.history.record(label, log, group)
+
+    # Batches: one transaction, one save, one refresh and one undo step each
+
+    def run_batch(self, label, action):
+        """Run action() as a transaction; it is rolled back if it raises"""
+        with self.tasks.transaction() as log:
+            action()
+        if log:
+            self.history.record(label, log)
+            self.save(self.changes_for(log))
+        return log
+
+    def complete_many(self, task_ids, completed=None):
+        # Complete them all, or (by default) reopen them all if they are all done already
+        tasks = [self._task(task_id) for task_id in task_ids]
+        if completed is None:
+            completed = not all(task["completed"] for task in tasks)
+        return self.run_batch("Complete", lambda: [self.tasks.update(task["id"], **self._completion(task, completed))
+                                                   for task in tasks if task["completed"] != completed])
+
+    def add_many(self, tasks):
+        """Add tasks made by new_task() in one batch"""
+        return self.run_batch("Add", lambda: self.tasks.extend(tasks))
+
+    def delete_many(self, task_ids):
+        return self.run_batch("Delete", lambda: self.tasks.remove_many(task_ids))
+
+    def update_many(self, task_ids, label="Edit", **fields):
+        return self.run_batch(label, lambda: [self.tasks.update(task_id, **fields) for task_id in task_ids])
+
+    def add_tag(self, task_ids, tag):
+        tag = tag.strip()
+        if not tag:
+            raise ValueError("Please enter a tag!")
+        tasks = [self._task(task_id) for task_id in task_ids]
+        return self.run_batch("Add tag", lambda: [self.tasks.update(task["id"], tags=(task.get("tags") or []) + [tag])
+                                                  for task in tasks if tag not in (task.get("tags") or [])])
+
+    def completed_ids(self):
+        return [task["id"] for task in self.tasks if task["completed"]]
+
+    def delete_completed(self):
+        return self.delete_many(self.completed_ids())
+
+    def undo(self):
+        """Revert the last change or batch; returns its label, or None if there is nothing to undo.
+
+        Raises KeyError (with nothing changed) if one of its tasks has been
+        deleted since by something outside the history, such as a sync.
+        """
+        return self._replay(self.history.undo())
+
+    def redo(self):
+        """Make an undone change again; returns its label, or None"""
+        return self._replay(self.history.redo())
+
+    def _replay(self, result):
+        if result is None:
+            return None
+        label, log = result
+        self.save(self.changes_for(log))
+        return label
+
+    def changes_for(self, log):
+        # Turn an undo log into storage changes, one per task, in its final state
+        changes = {}
+        for op, target, _ in log:
+            if op == "add":
+                changes[target["id"]] = ("delete", target)
+            else:
+                task = self.tasks.get(target)
+                changes[target] = ("put", task) if task is not None else changes.get(target)
+        return [change for change in changes.values() if change is not None]
+
+    # Import / export
+
+    def importer(self, path, **kwargs):
+        """A CsvImporter thread (not started yet); pass its batches to add_imported()"""
+        return CsvImporter(path, self.tasks, **kwargs)
+
+    def add_imported(self, batch, importer=None):
+        # All batches of one import make a single undo step
+        with self.step("Import", group=importer):
+            self.tasks.extend(batch)
+        self.save([("put", task) for task in batch])
+
+    def import_csv(self, path, batch_size=5000, dedupe=True):
+        """Import a CSV export and wait for it; returns (imported, skipped)"""
+        importer = self.importer(path, batch_size=batch_size, dedupe=dedupe)
+        importer.start()
+        while True:
+            message = importer.queue.get()
+            if message[0] == "batch":
+                self.add_imported(message[1], importer)
+            elif message[0] == "error":
+                raise ValueError(f"Error importing tasks: {message[1]}")
+            else:
+                return message[1], message[2]
+
+    def exporter(self, path, status="all", category=None):
+        """A TaskExporter thread (not started yet); it takes the snapshot itself"""
+        return TaskExporter(self.tasks, path, status, category)
+
+    def export(self, path, status="all", category=None, fmt=None, compress=None):
+        """Export and wait; returns the number of tasks written"""
+        return export_tasks(self.tasks.snapshot(), path, status, category, fmt, compress)
@@ -0,0 +1,24 @@
+from recurrence import first_occurrence, make_rule
+from storage import JsonStorage
+from task_store import TaskStore
+
+
+def test_first_occurrence_skips_a_start_outside_the_weekdays():
+    # 2024-05-07 is a Tuesday; the rule only repeats on Mondays and Thursdays
+    rule = make_rule("weekly", "2024-05-07", weekdays=[0, 3])
+    assert first_occurrence(rule) == "2024-05-09"
+    assert first_occurrence(rule, "2024-05-10") == "2024-05-13"
+    assert first_occurrence(make_rule("daily", "2024-05-07", count=1), "2024-05-08") is None
+
+
+def test_repeating_task_is_due_on_an_occurrence(tmp_path):
+    store = TaskStore(JsonStorage(str(tmp_path / "tasks.json")))
+    undated = store.add("gym")
+    dated = store.add("report", due_date="2024-05-07")
+    store.edit(undated["id"], recurrence=make_rule("weekly", "2024-05-07", weekdays=[0, 3]))
+    store.edit(dated["id"], recurrence=make_rule("weekly", "2024-05-07", weekdays=[0, 3]))
+    assert store.get(undated["id"])["due_date"] == "2024-05-09"
+    assert store.get(dated["id"])["due_date"] == "2024-05-09"
+    store.complete(dated["id"])
+    assert store.get(dated["id"])["due_date"] == "2024-05-13"
+    store.close()
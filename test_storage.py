@@ -0,0 +1,63 @@
+import json
+
+from storage import JournalStorage, JsonStorage
+from task_store import TaskStore
+
+
+def write_old_file(path):
+    # A tasks.json from before task ids
+    tasks = [{"task": "one", "completed": False, "category": "Work", "priority": "High", "due_date": "No due date"},
+             {"task": "two", "completed": False, "category": "Home", "priority": "Low", "due_date": "No due date"}]
+    with open(path, "w") as f:
+        json.dump(tasks, f)
+
+
+def write_numbered_dependencies(path):
+    # Ids, but dependencies still stored as 1-based positions in the list
+    tasks = [{"id": name, "task": name, "completed": False, "category": "Work", "priority": "High",
+              "due_date": "No due date", "dependencies": dependencies}
+             for name, dependencies in (("a", []), ("b", []), ("c", [2]))]
+    with open(path, "w") as f:
+        json.dump(tasks, f)
+
+
+def load_store(storage, progressive):
+    store = TaskStore(storage)
+    if progressive:
+        loader = store.loader()
+        loader.start()
+        store.load_all(loader)
+    else:
+        store.load()
+    return store
+
+
+def test_ids_given_on_load_are_kept(tmp_path):
+    for storage_class in (JsonStorage, JournalStorage):
+        for progressive in (False, True):
+            path = str(tmp_path / f"{storage_class.__name__}{progressive}.json")
+            write_old_file(path)
+            store = load_store(storage_class(path), progressive)
+            ids = [task["id"] for task in store.tasks]
+            store.complete(ids[0])
+            store.close()
+
+            store = load_store(storage_class(path), progressive)
+            assert [task["id"] for task in store.tasks] == ids
+            assert [(task["task"], task["completed"]) for task in store.tasks] == [("one", True), ("two", False)]
+            store.close()
+
+
+def test_migrated_dependencies_are_kept(tmp_path):
+    for storage_class in (JsonStorage, JournalStorage):
+        for progressive in (False, True):
+            path = str(tmp_path / f"{storage_class.__name__}{progressive}.json")
+            write_numbered_dependencies(path)
+            store = load_store(storage_class(path), progressive)
+            assert store.get("c")["dependencies"] == ["b"]
+            store.delete("a")
+            store.close()
+
+            store = load_store(storage_class(path), progressive)
+            assert store.get("c")["dependencies"] == ["b"]
+            store.close()
@@ -1,34 +1,61 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
-import os
-from datetime import datetime, timedelta
-from tkcalendar import Calendar
 from tkinter import simpledialog
-import random
-import csv
-import threading
-import time
+import os
+import queue
+import sys
+from virtual_list import VirtualListbox
+from perf import monitor, timed
+from recurrence import FREQUENCIES, WEEKDAYS, default_start, make_rule, parse_weekdays
+from sorted_views import SORT_KEYS
+from sync import DEFAULT_URL, SyncClient
+from task_store import TaskStore
+from workspaces import Workspace
 
 class TodoApp:
-    def __init__(self, root):
+    PRIORITY_EMOJI = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}
+    CATEGORY_EMOJI = {"Work": "💼", "Personal": "👤", "Shopping": "🛒", "Health": "❤️", "Other": "📌"}
+    SEARCH_DELAY_MS = 150
+    IMPORT_POLL_MS = 50
+    AUTOSAVE_POLL_MS = 1000
+    PERF_POLL_MS = 500
+    LOAD_POLL_MS = 10
+    SYNC_INTERVAL_MS = 60000
+    
+    def __init__(self, root, storage=None, workspace=None, list_name="tasks.json"):
         self.root = root
         self.root.title("✨ Task Manager")
         self.root.geometry("1000x1000")  # Increased height to show all buttons
         self.root.minsize(800, 800)  # Set minimum window size
         self.root.configure(bg="#f0f0f0")
         
-        # Initialize tasks list and filter state
-        self.tasks = []
+        # The tasks and everything done to them live in the store; this class only shows them.
+        # With a workspace the store is one of several lists and can be switched
+        self.workspace = workspace
+        self.list_name = list_name
+        if workspace is not None:
+            workspace.on_reminder = self.on_reminder_due
+            store = workspace.new_store(list_name)
+        else:
+            store = TaskStore(storage, on_reminder=self.on_reminder_due)
+        self.bind_store(store)
         self.current_filter = "all"
         self.current_theme = "light"
         self.current_sort = "priority"
-        self.reminder_thread = None
-        self.stop_reminder_thread = False
+        self.autosave_error = None
+        self.display_cache = {}  # task id -> formatted row text
+        self.current_search = ""
+        self.refresh_pending = None  # None, "stats" or "full"
+        self.search_after_id = None
+        self.importer = None
+        self.exporter = None
+        self.loader = None
+        self.sync = None  # SyncClient of the current list, once it has been synced
+        self.sync_after_id = None
         
         # Define categories and priorities
-        self.categories = ["Work", "Personal", "Shopping", "Health", "Other"]
-        self.priorities = ["High", "Medium", "Low"]
+        self.categories = list(TaskStore.CATEGORIES)
+        self.priorities = list(TaskStore.PRIORITIES)
         
         # Theme colors
         self.theme_colors = {
@@ -111,6 +138,34 @@ class TodoApp:
                                       style="Custom.TButton")
         self.import_button.grid(row=0, column=3, padx=5)
         
+        self.perf_button = ttk.Button(self.title_frame,
+                                    text="⏱ Performance",
+                                    command=self.toggle_perf,
+                                    style="Custom.TButton")
+        self.perf_button.grid(row=0, column=4, padx=5)
+        
+        self.sync_button = ttk.Button(self.title_frame,
+                                    text="🔄 Sync",
+                                    command=self.sync_now,
+                                    style="Custom.TButton")
+        self.sync_button.grid(row=0, column=5, padx=5)
+        
+        # List switcher; other lists show their counts without being loaded
+        if workspace is not None:
+            self.list_frame = ttk.Frame(self.title_frame, style="Custom.TFrame")
+            self.list_frame.grid(row=1, column=0, columnspan=6, sticky=tk.W, pady=(10, 0))
+            ttk.Label(self.list_frame, text="📂 List:", style="Subtitle.TLabel").grid(row=0, column=0, padx=(0, 5))
+            self.list_labels = {}  # combobox entry -> list name
+            self.list_var = tk.StringVar(value=list_name)
+            self.list_combo = ttk.Combobox(self.list_frame, textvariable=self.list_var, state="readonly",
+                                           width=40, postcommand=self.update_list_choices)
+            self.list_combo.grid(row=0, column=1, padx=5)
+            self.list_combo.bind("<<ComboboxSelected>>",
+                                 lambda e: self.switch_list(self.list_labels.get(self.list_var.get(), self.list_name)))
+            ttk.Button(self.list_frame, text="➕ New List", command=self.new_list).grid(row=0, column=2, padx=5)
+            workspace.refresh_summaries()
+        self.update_title()
+        
         # Stats frame
         self.stats_frame = ttk.Frame(self.main_frame, style="Custom.TFrame")
         self.stats_frame.grid(row=1, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(0, 20))
@@ -198,8 +253,8 @@ class TodoApp:
                                    style="Custom.TButton")
         self.add_button.grid(row=0, column=4)
         
-        # Create task listbox with custom style
-        self.task_listbox = tk.Listbox(self.main_frame,
+        # Create task listbox with custom style (only the rows in view are drawn)
+        self.task_listbox = VirtualListbox(self.main_frame,
                                      width=80,
                                      height=15,  # Reduced height to show buttons
                                      font=('Helvetica', 11),
@@ -211,7 +266,8 @@ class TodoApp:
                                      borderwidth=0,
                                      highlightthickness=1,
                                      highlightbackground="#bdc3c7",
-                                     highlightcolor="#3498db")
+                                     highlightcolor="#3498db",
+                                     selectmode=tk.EXTENDED)  # Ctrl/Shift-click to pick several tasks
         self.task_listbox.grid(row=5, column=0, columnspan=3, pady=(0, 20), sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # Add scrollbar
@@ -291,6 +347,70 @@ class TodoApp:
                                         style="Custom.TButton")
         self.filter_completed.grid(row=0, column=2, padx=5)
         
+        # Dependency filters: active tasks whose dependencies are all done, or still waiting on some
+        self.filter_ready = ttk.Button(self.filter_frame,
+                                     text="Ready",
+                                     command=lambda: self.filter_tasks("ready"),
+                                     style="Custom.TButton")
+        self.filter_ready.grid(row=0, column=3, padx=5)
+        
+        self.filter_blocked = ttk.Button(self.filter_frame,
+                                       text="Blocked",
+                                       command=lambda: self.filter_tasks("blocked"),
+                                       style="Custom.TButton")
+        self.filter_blocked.grid(row=0, column=4, padx=5)
+        
+        # Batch actions on every selected task; each is one save, one refresh and one undo step
+        self.batch_frame = ttk.Frame(self.main_frame, style="Custom.TFrame")
+        self.batch_frame.grid(row=8, column=0, columnspan=4, pady=(0, 20))
+        
+        self.priority_button = ttk.Menubutton(self.batch_frame, text="Set Priority")
+        priority_menu = tk.Menu(self.priority_button, tearoff=0)
+        for priority in self.priorities:
+            priority_menu.add_command(label=priority, command=lambda p=priority: self.batch_update("Set priority", priority=p))
+        self.priority_button["menu"] = priority_menu
+        self.priority_button.grid(row=0, column=0, padx=5)
+        
+        self.category_button = ttk.Menubutton(self.batch_frame, text="Set Category")
+        category_menu = tk.Menu(self.category_button, tearoff=0)
+        for category in self.categories:
+            category_menu.add_command(label=category, command=lambda c=category: self.batch_update("Set category", category=c))
+        self.category_button["menu"] = category_menu
+        self.category_button.grid(row=0, column=1, padx=5)
+        
+        self.tag_button = ttk.Button(self.batch_frame,
+                                   text="🏷 Add Tag",
+                                   command=self.tag_selected,
+                                   style="Custom.TButton")
+        self.tag_button.grid(row=0, column=2, padx=5)
+        
+        self.clear_completed_button = ttk.Button(self.batch_frame,
+                                               text="🧹 Delete Completed",
+                                               command=self.delete_completed,
+                                               style="Custom.TButton")
+        self.clear_completed_button.grid(row=0, column=3, padx=5)
+        
+        self.undo_button = ttk.Button(self.batch_frame,
+                                    text="↶ Undo",
+                                    command=self.undo,
+                                    style="Custom.TButton")
+        self.undo_button.grid(row=0, column=4, padx=5)
+        
+        self.redo_button = ttk.Button(self.batch_frame,
+                                    text="↷ Redo",
+                                    command=self.redo,
+                                    style="Custom.TButton")
+        self.redo_button.grid(row=0, column=5, padx=5)
+        
+        # Timings panel, shown (and measured) only while the Performance button is on
+        self.perf_frame = ttk.Frame(self.main_frame, style="Custom.TFrame")
+        self.perf_frame.grid(row=9, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(0, 20))
+        self.perf_label = ttk.Label(self.perf_frame, text="", font=('Courier', 9), style="Stats.TLabel", justify=tk.LEFT)
+        self.perf_label.grid(row=0, column=0, rowspan=2, sticky=tk.W)
+        ttk.Button(self.perf_frame, text="💾 Save Timings", command=self.dump_perf).grid(row=0, column=1, padx=5)
+        ttk.Button(self.perf_frame, text="Reset", command=monitor.reset).grid(row=1, column=1, padx=5)
+        self.perf_frame.grid_remove()
+        
         # Configure grid weights
         self.root.grid_rowconfigure(0, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
@@ -299,11 +419,14 @@ class TodoApp:
         self.main_frame.grid_columnconfigure(1, weight=1)
         self.main_frame.grid_columnconfigure(2, weight=1)
         
-        # Load tasks from file
+        # Load tasks from file; they arrive in batches once the window is up
         self.load_tasks()
         
-        # Bind Enter key to add task
+        # Bind Enter key to add task, and the undo/redo keys anywhere in the window
         self.task_entry.bind('<Return>', lambda e: self.add_task())
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
+        self.root.bind('<Control-Z>', lambda e: self.redo())
         
         # Set focus to entry
         self.task_entry.focus()
@@ -311,101 +434,244 @@ class TodoApp:
         # Update stats
         self.update_stats()
         
-        # Start reminder thread
-        self.start_reminder_thread()
-    
-    def start_reminder_thread(self):
-        self.stop_reminder_thread = False
-        self.reminder_thread = threading.Thread(target=self.check_reminders)
-        self.reminder_thread.daemon = True
-        self.reminder_thread.start()
-    
-    def check_reminders(self):
-        while not self.stop_reminder_thread:
-            now = datetime.now()
-            for task in self.tasks:
-                if not task["completed"] and task["due_date"] != "No due date":
-                    due_date = datetime.strptime(task["due_date"], "%Y-%m-%d")
-                    if due_date.date() == now.date():
-                        self.root.after(0, lambda t=task: self.show_reminder(t))
-            time.sleep(60)  # Check every minute
+        # The reminder and autosave threads start once loading is done; make sure changes reach the disk before exiting
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(self.AUTOSAVE_POLL_MS, self.poll_autosave)
+    
+    def bind_store(self, store):
+        if getattr(self, "tasks", None) is not None:
+            self.tasks.unsubscribe(self.on_tasks_changed)
+        self.store = store
+        self.tasks = store.tasks
+        self.tasks.subscribe(self.on_tasks_changed)
+    
+    def update_title(self):
+        title = "✨ Task Manager"
+        if self.workspace is not None:
+            title += f" — {self.list_name}"
+        self.root.title(title)
+    
+    def update_list_choices(self):
+        # Counts come from the loaded store or the workspace index; lists being recounted show none yet
+        self.workspace.refresh_summaries()
+        self.list_labels = {}
+        for name in self.workspace.names():
+            summary = self.workspace.summary(name)
+            label = name
+            if summary is not None:
+                label += f"  ({summary['active']} active, {summary['completed']} done"
+                label += f", {summary['overdue']} overdue)" if summary["overdue"] else ")"
+            self.list_labels[label] = name
+        self.list_combo.configure(values=list(self.list_labels))
+    
+    def switch_list(self, name):
+        if name == self.list_name:
+            return
+        if self.loader is not None or self.importer is not None:
+            messagebox.showwarning("Warning", "Please wait until the current list has finished loading or importing!")
+            self.list_var.set(self.list_name)
+            return
+        # The old list stays loaded in the workspace cache (until evicted) but stops reminding and syncing
+        self.stop_sync()
+        self.store.reminders.stop()
+        self.list_name = name
+        self.list_var.set(name)
+        self.update_title()
+        self.display_cache.clear()
+        store = self.workspace.get(name)
+        if store is not None:
+            self.bind_store(store)
+            self.workspace.activate(name)
+            store.reminders.start()
+            self.schedule_refresh("full")
+            self.resume_sync()
+        else:
+            self.bind_store(self.workspace.new_store(name))
+            self.workspace.activate(name)
+            self.load_tasks()
+            self.schedule_refresh("full")
+    
+    def new_list(self):
+        name = simpledialog.askstring("New List", "Name of the new list:", parent=self.root)
+        if not name:
+            return
+        try:
+            name = self.workspace.create(name)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.switch_list(name)
+    
+    def on_reminder_due(self, task_id, kind):
+        # Called from the scheduler thread; hand over to the Tk thread
+        self.root.after(0, lambda: self.show_due_reminder(task_id, kind))
+    
+    def show_due_reminder(self, task_id, kind):
+        task = self.tasks.get(task_id)
+        if task is None or task["completed"]:
+            return
+        if kind == "due":
+            self.show_reminder(task)
+        else:
+            messagebox.showinfo("Task Reminder", f"Reminder: {task['task']}")
     
     def show_reminder(self, task):
         messagebox.showinfo("Task Reminder", f"Task due today: {task['task']}")
     
     def export_tasks(self):
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-        )
-        if file_path:
-            try:
-                with open(file_path, 'w', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(["Task", "Category", "Priority", "Due Date", "Completed", "Notes", "Tags"])
-                    for task in self.tasks:
-                        writer.writerow([
-                            task["task"],
-                            task["category"],
-                            task["priority"],
-                            task["due_date"],
-                            task["completed"],
-                            task.get("notes", ""),
-                            ", ".join(task.get("tags", []))
-                        ])
-                messagebox.showinfo("Success", "Tasks exported successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error exporting tasks: {str(e)}")
+        if self.exporter is not None:
+            messagebox.showwarning("Warning", "An export is already running!")
+            return
+        export_window = tk.Toplevel(self.root)
+        export_window.title("Export Tasks")
+        export_window.geometry("300x220")
+        
+        # Only the chosen tasks are formatted and written
+        ttk.Label(export_window, text="Tasks:").pack(pady=5)
+        status_var = tk.StringVar(value=self.current_filter if self.current_filter not in TaskStore.GRAPH_FILTERS else "active")
+        ttk.Combobox(export_window, textvariable=status_var, values=["all", "active", "completed"], state="readonly").pack(pady=5)
+        
+        ttk.Label(export_window, text="Category:").pack(pady=5)
+        category_var = tk.StringVar(value="All")
+        ttk.Combobox(export_window, textvariable=category_var, values=["All"] + self.categories).pack(pady=5)
+        
+        def choose_file():
+            file_path = filedialog.asksaveasfilename(
+                parent=export_window,
+                defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"),
+                           ("JSON Lines", "*.jsonl"),
+                           ("Task archive (columnar)", "*.tcol"),
+                           ("Gzipped export", "*.gz"),
+                           ("All files", "*.*")]
+            )
+            if file_path:
+                category = category_var.get()
+                export_window.destroy()
+                # Write from a snapshot on a worker thread so the window stays responsive
+                self.exporter = self.store.exporter(file_path, status_var.get(),
+                                                    None if category == "All" else category)
+                self.exporter.start()
+                self.show_export_progress()
+                self.root.after(self.IMPORT_POLL_MS, self.poll_export)
+        
+        ttk.Button(export_window, text="Choose File...", command=choose_file).pack(pady=15)
+    
+    def show_export_progress(self):
+        self.export_window = tk.Toplevel(self.root)
+        self.export_window.title("Exporting Tasks")
+        self.export_window.geometry("320x140")
+        self.export_window.protocol("WM_DELETE_WINDOW", self.exporter.cancel)
+        
+        ttk.Label(self.export_window, text="📤 Exporting tasks...").pack(pady=10)
+        self.export_progress = ttk.Progressbar(self.export_window,
+                                               length=260,
+                                               mode='determinate',
+                                               style="Horizontal.TProgressbar")
+        self.export_progress.pack(pady=5)
+        ttk.Button(self.export_window, text="Cancel", command=self.exporter.cancel).pack(pady=10)
+    
+    def poll_export(self):
+        try:
+            message = self.exporter.queue.get_nowait()
+        except queue.Empty:
+            self.export_progress["value"] = self.exporter.progress * 100
+            self.root.after(self.IMPORT_POLL_MS, self.poll_export)
+            return
+        self.export_window.destroy()
+        self.exporter = None
+        if message[0] == "error":
+            messagebox.showerror("Error", f"Error exporting tasks: {message[1]}")
+        elif message[3]:
+            messagebox.showinfo("Export Cancelled", "Export cancelled, nothing was saved.")
+        else:
+            messagebox.showinfo("Success", f"Tasks exported successfully! ({message[1]} tasks)")
     
     def import_tasks(self):
+        if self.importer is not None:
+            messagebox.showwarning("Warning", "An import is already running!")
+            return
         file_path = filedialog.askopenfilename(
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
         if file_path:
-            try:
-                with open(file_path, 'r') as file:
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        task_data = {
-                            "task": row["Task"],
-                            "category": row["Category"],
-                            "priority": row["Priority"],
-                            "due_date": row["Due Date"],
-                            "completed": row["Completed"].lower() == "true",
-                            "notes": row["Notes"],
-                            "tags": [tag.strip() for tag in row["Tags"].split(",") if tag.strip()],
-                            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        }
-                        self.tasks.append(task_data)
-                self.update_task_list()
-                self.save_tasks()
-                messagebox.showinfo("Success", "Tasks imported successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error importing tasks: {str(e)}")
+            # Parse on a worker thread; batches are committed here as they arrive
+            self.importer = self.store.importer(file_path)
+            self.importer.start()
+            self.show_import_progress()
+            self.root.after(self.IMPORT_POLL_MS, self.poll_import)
     
-    def update_stats(self):
-        total_tasks = len(self.tasks)
-        completed_tasks = sum(1 for task in self.tasks if task["completed"])
-        active_tasks = total_tasks - completed_tasks
-        completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    def show_import_progress(self):
+        self.import_window = tk.Toplevel(self.root)
+        self.import_window.title("Importing Tasks")
+        self.import_window.geometry("320x140")
+        self.import_window.protocol("WM_DELETE_WINDOW", self.importer.cancel)
+        
+        self.import_label = ttk.Label(self.import_window, text="📥 Importing tasks...")
+        self.import_label.pack(pady=10)
+        self.import_progress = ttk.Progressbar(self.import_window,
+                                               length=260,
+                                               mode='determinate',
+                                               style="Horizontal.TProgressbar")
+        self.import_progress.pack(pady=5)
+        ttk.Button(self.import_window, text="Cancel", command=self.importer.cancel).pack(pady=10)
+        self.import_count = 0
+    
+    @timed("import batch")
+    def poll_import(self):
+        try:
+            message = self.importer.queue.get_nowait()
+        except queue.Empty:
+            self.root.after(self.IMPORT_POLL_MS, self.poll_import)
+            return
+        
+        if message[0] == "batch":
+            # One bulk commit, one journal write and one list refresh per batch
+            _, batch, progress = message
+            self.store.add_imported(batch, self.importer)
+            self.import_count += len(batch)
+            self.import_progress["value"] = progress * 100
+            self.import_label.configure(text=f"📥 Imported {self.import_count} tasks...")
+            self.root.after(self.IMPORT_POLL_MS, self.poll_import)
+            return
         
-        stats_text = f"📊 Stats: {total_tasks} total tasks | {active_tasks} active | {completed_tasks} completed | {completion_rate:.1f}% completion rate"
+        self.import_window.destroy()
+        self.importer = None
+        if message[0] == "error":
+            messagebox.showerror("Error", f"Error importing tasks: {message[1]}")
+        elif message[3]:
+            messagebox.showinfo("Import Cancelled", f"Import cancelled after {self.import_count} tasks.")
+        else:
+            messagebox.showinfo("Success", f"Tasks imported successfully! ({message[1]} imported, {message[2]} duplicates skipped)")
+    
+    @timed("update_stats")
+    def update_stats(self):
+        # Counts are kept current by TaskStats, so this never scans the task list
+        stats = self.store.stats
+        stats_text = f"📊 Stats: {stats.total} total tasks | {stats.active} active | {stats.completed} completed | {stats.completion_rate:.1f}% completion rate"
+        stats_text += f" | ⏰ {stats.overdue()} overdue | {stats.due_today()} due today"
+        if self.loader is not None:
+            stats_text += " | 📥 Loading..."
         self.stats_label.configure(text=stats_text)
         
         # Update priority progress bars
         for priority in self.priorities:
-            priority_tasks = [task for task in self.tasks if task["priority"] == priority]
-            if priority_tasks:
-                completed = sum(1 for task in priority_tasks if task["completed"])
-                progress = (completed / len(priority_tasks)) * 100
-                self.priority_bars[priority]["value"] = progress
-            else:
-                self.priority_bars[priority]["value"] = 0
+            self.priority_bars[priority]["value"] = stats.priority_progress(priority)
     
     def on_search_change(self, *args):
+        # Debounce so fast typing only triggers one search once the user pauses
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.SEARCH_DELAY_MS, self.run_search)
+    
+    def run_search(self):
+        self.search_after_id = None
         self.update_task_list()
     
     def set_due_date(self):
+        # tkcalendar is slow to import and only needed here
+        from tkcalendar import Calendar
+        
         date_window = tk.Toplevel(self.root)
         date_window.title("Select Due Date")
         date_window.geometry("300x300")
@@ -421,37 +687,22 @@ class TodoApp:
         ttk.Button(date_window, text="Confirm", command=set_date).pack(pady=10)
     
     def add_task(self):
-        task = self.task_var.get().strip()
-        if task:
-            task_data = {
-                "task": task,
-                "completed": False,
-                "category": self.category_var.get(),
-                "priority": self.priority_var.get(),
-                "due_date": self.due_date_var.get(),
-                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "notes": "",
-                "tags": [],
-                "dependencies": []  # New field for task dependencies
-            }
-            self.tasks.append(task_data)
-            self.update_task_list()
-            self.task_var.set("")
-            self.due_date_var.set("No due date")
-            self.save_tasks()
-            self.task_entry.focus()
-            self.update_stats()
-        else:
-            messagebox.showwarning("Warning", "Please enter a task!")
+        try:
+            self.store.add(self.task_var.get(), self.category_var.get(), self.priority_var.get(), self.due_date_var.get())
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        self.task_var.set("")
+        self.due_date_var.set("No due date")
+        self.task_entry.focus()
     
     def edit_task(self):
         try:
-            selected_index = self.task_listbox.curselection()[0]
-            task = self.tasks[selected_index]
+            task = self.selected_task()
             
             edit_window = tk.Toplevel(self.root)
             edit_window.title("Edit Task")
-            edit_window.geometry("400x500")  # Increased height for new fields
+            edit_window.geometry("400x820")  # Increased height for new fields
             
             # Task text
             ttk.Label(edit_window, text="Task:").pack(pady=5)
@@ -473,7 +724,7 @@ class TodoApp:
             
             # Dependencies
             ttk.Label(edit_window, text="Dependencies:").pack(pady=5)
-            dependencies_var = tk.StringVar(value=", ".join(task.get("dependencies", [])))
+            dependencies_var = tk.StringVar(value=", ".join(self.dependency_labels(task)))
             dependencies_entry = ttk.Entry(edit_window, textvariable=dependencies_var, width=40)
             dependencies_entry.pack(pady=5)
             ttk.Label(edit_window, text="(Enter task numbers separated by commas)").pack()
@@ -490,15 +741,57 @@ class TodoApp:
             tags_entry = ttk.Entry(edit_window, textvariable=tags_var, width=40)
             tags_entry.pack(pady=5)
             
+            # Reminders in addition to the one on the due date
+            ttk.Label(edit_window, text="Reminders (YYYY-MM-DD HH:MM, comma-separated):").pack(pady=5)
+            reminders_var = tk.StringVar(value=", ".join(task.get("reminders", [])))
+            reminders_entry = ttk.Entry(edit_window, textvariable=reminders_var, width=40)
+            reminders_entry.pack(pady=5)
+            
+            # Repeat: the due date moves to the next occurrence each time the task is completed
+            rule = task.get("recurrence") or {}
+            ttk.Label(edit_window, text="Repeat:").pack(pady=5)
+            repeat_frame = ttk.Frame(edit_window)
+            repeat_frame.pack(pady=5)
+            repeat_var = tk.StringVar(value=rule.get("freq", "never"))
+            ttk.Combobox(repeat_frame, textvariable=repeat_var, values=["never"] + list(FREQUENCIES),
+                         state="readonly", width=10).grid(row=0, column=0, padx=5)
+            ttk.Label(repeat_frame, text="every").grid(row=0, column=1)
+            interval_var = tk.StringVar(value=str(rule.get("interval", 1)))
+            ttk.Entry(repeat_frame, textvariable=interval_var, width=4).grid(row=0, column=2, padx=5)
+            ttk.Label(edit_window, text="On weekdays (weekly only, e.g. mon, thu):").pack()
+            weekdays_var = tk.StringVar(value=", ".join(WEEKDAYS[day] for day in rule.get("weekdays", [])))
+            ttk.Entry(edit_window, textvariable=weekdays_var, width=40).pack(pady=5)
+            ttk.Label(edit_window, text="Ends on (YYYY-MM-DD) / after this many times:").pack()
+            end_frame = ttk.Frame(edit_window)
+            end_frame.pack(pady=5)
+            until_var = tk.StringVar(value=rule.get("until", ""))
+            ttk.Entry(end_frame, textvariable=until_var, width=12).grid(row=0, column=0, padx=5)
+            count_var = tk.StringVar(value=str(rule.get("count", "")))
+            ttk.Entry(end_frame, textvariable=count_var, width=6).grid(row=0, column=1, padx=5)
+            
             def save_changes():
-                task["task"] = task_var.get()
-                task["category"] = category_var.get()
-                task["priority"] = priority_var.get()
-                task["notes"] = notes_text.get("1.0", tk.END).strip()
-                task["tags"] = [tag.strip() for tag in tags_var.get().split(",") if tag.strip()]
-                task["dependencies"] = [dep.strip() for dep in dependencies_var.get().split(",") if dep.strip()]
-                self.update_task_list()
-                self.save_tasks()
+                try:
+                    recurrence = None
+                    if repeat_var.get() != "never":
+                        recurrence = make_rule(repeat_var.get(), default_start(task), interval_var.get().strip(),
+                                               parse_weekdays(weekdays_var.get()), until_var.get().strip(),
+                                               count_var.get().strip())
+                    fields = dict(task=task_var.get(),
+                                  category=category_var.get(),
+                                  priority=priority_var.get(),
+                                  notes=notes_text.get("1.0", tk.END).strip(),
+                                  tags=[tag.strip() for tag in tags_var.get().split(",") if tag.strip()],
+                                  dependencies=self.parse_dependencies(dependencies_var.get(), task))
+                    # Only when they changed, so tasks that never had them don't get empty ones
+                    reminders = [r.strip() for r in reminders_var.get().split(",") if r.strip()]
+                    if reminders != task.get("reminders", []):
+                        fields["reminders"] = reminders
+                    if recurrence != task.get("recurrence"):
+                        fields["recurrence"] = recurrence
+                    self.store.edit(task["id"], **fields)
+                except ValueError as e:
+                    messagebox.showwarning("Warning", str(e), parent=edit_window)
+                    return
                 edit_window.destroy()
             
             ttk.Button(edit_window, text="Save Changes", command=save_changes).pack(pady=20)
@@ -507,67 +800,236 @@ class TodoApp:
             messagebox.showwarning("Warning", "Please select a task!")
     
     def complete_task(self):
+        tasks = self.selected_tasks()
+        if len(tasks) > 1:
+            self.run_batch("Complete", lambda: self.store.complete_many([task["id"] for task in tasks]))
+            return
         try:
-            selected_index = self.task_listbox.curselection()[0]
-            self.tasks[selected_index]["completed"] = not self.tasks[selected_index]["completed"]
-            self.update_task_list()
-            self.save_tasks()
-            self.update_stats()
+            self.store.complete(self.selected_task()["id"])
         except IndexError:
             messagebox.showwarning("Warning", "Please select a task!")
     
     def delete_task(self):
+        tasks = self.selected_tasks()
+        if len(tasks) > 1:
+            if messagebox.askyesno("Delete Tasks", f"Delete {len(tasks)} tasks?"):
+                self.run_batch("Delete", lambda: self.store.delete_many([task["id"] for task in tasks]))
+            return
         try:
-            selected_index = self.task_listbox.curselection()[0]
-            del self.tasks[selected_index]
-            self.update_task_list()
-            self.save_tasks()
-            self.update_stats()
+            self.store.delete(self.selected_task()["id"])
         except IndexError:
             messagebox.showwarning("Warning", "Please select a task!")
     
+    def selected_tasks(self):
+        return [self.tasks.get(self.task_listbox.items[index]) for index in self.task_listbox.curselection()]
+    
+    def batch_update(self, label, **fields):
+        tasks = self.selected_tasks()
+        if not tasks:
+            messagebox.showwarning("Warning", "Please select a task!")
+            return
+        self.run_batch(label, lambda: self.store.update_many([task["id"] for task in tasks], label, **fields))
+    
+    def tag_selected(self):
+        tasks = self.selected_tasks()
+        if not tasks:
+            messagebox.showwarning("Warning", "Please select a task!")
+            return
+        tag = simpledialog.askstring("Add Tag", f"Tag to add to {len(tasks)} task(s):", parent=self.root)
+        if tag and tag.strip():
+            self.run_batch("Add tag", lambda: self.store.add_tag([task["id"] for task in tasks], tag))
+    
+    def delete_completed(self):
+        completed = self.store.completed_ids()
+        if not completed:
+            messagebox.showinfo("Delete Completed", "There are no completed tasks.")
+        elif messagebox.askyesno("Delete Completed", f"Delete {len(completed)} completed tasks?"):
+            self.run_batch("Delete completed", lambda: self.store.delete_many(completed))
+    
+    def run_batch(self, label, action):
+        # The store runs each batch as one transaction: one refresh, one save and one undo step,
+        # rolled back as a whole if it fails
+        try:
+            action()
+        except Exception as e:
+            messagebox.showerror("Error", f"{label} failed: {str(e)}")
+    
+    def undo(self):
+        self.replay(self.store.undo, "Undo")
+    
+    def redo(self):
+        self.replay(self.store.redo, "Redo")
+    
+    def replay(self, action, title):
+        if self.loader is not None or self.importer is not None:
+            return
+        try:
+            label = action()
+        except KeyError:
+            # A task from the step was deleted outside the history (e.g. by a sync); the store has rolled back
+            messagebox.showwarning(title, "The tasks have changed since, so this can't be undone.")
+            self.update_undo_buttons()
+            return
+        if label is None:
+            messagebox.showinfo(title, f"Nothing to {title.lower()}.")
+    
+    def update_undo_buttons(self):
+        undo_label, redo_label = self.store.history.undo_label, self.store.history.redo_label
+        self.undo_button.configure(text=f"↶ Undo {undo_label}" if undo_label else "↶ Undo",
+                                   state=tk.NORMAL if undo_label else tk.DISABLED)
+        self.redo_button.configure(text=f"↷ Redo {redo_label}" if redo_label else "↷ Redo",
+                                   state=tk.NORMAL if redo_label else tk.DISABLED)
+    
+    def dependency_labels(self, task):
+        # Dependencies are stored as ids; show them as the row numbers the user sees,
+        # or as a short id when the task isn't in the current view
+        labels = []
+        for dep in task.get("dependencies", []):
+            row = self.find_row(dep) if dep in self.tasks else None
+            labels.append(str(row + 1) if row is not None else f"#{dep[:8]}")
+        return labels
+    
+    def parse_dependencies(self, text, task):
+        # The reverse of dependency_labels: row numbers of the current view or short ids of existing dependencies
+        items = self.task_listbox.items
+        dependencies = []
+        for label in (part.strip() for part in text.split(",")):
+            if not label:
+                continue
+            if label.isdigit():
+                if not 1 <= int(label) <= len(items):
+                    raise ValueError(f"There is no task number {label}!")
+                dep = items[int(label) - 1]
+            else:
+                matches = [dep for dep in task.get("dependencies", []) if dep.startswith(label.lstrip("#"))]
+                if len(matches) != 1:
+                    raise ValueError(f"Unknown dependency {label}!")
+                dep = matches[0]
+            if dep == task["id"]:
+                raise ValueError("A task can't depend on itself!")
+            if dep not in dependencies:
+                dependencies.append(dep)
+        return dependencies
+    
+    def selected_task(self):
+        # Rows map to task ids, so this is right whatever filter, search or sort is active
+        selected_index = self.task_listbox.curselection()[0]
+        return self.tasks.get(self.task_listbox.items[selected_index])
+    
     def filter_tasks(self, filter_type):
         self.current_filter = filter_type
         self.update_task_list()
     
+    @timed("update_task_list")
     def update_task_list(self):
-        self.task_listbox.delete(0, tk.END)
-        
         # Get search term
         search_term = self.search_var.get().lower()
         if search_term == "🔍 search tasks...":
             search_term = ""
+        self.current_search = search_term
+        
+        # Already filtered, searched and ordered by the store (the listbox gets its own list of ids)
+        task_ids = self.store.query(self.current_filter, search_term, self.sort_var.get())
+        
+        self.task_listbox.set_items(task_ids, self.render_task)
+    
+    def sort_key(self):
+        return self.store.sort_key(self.sort_var.get())
+    
+    def matches_view(self, task):
+        # Same rules as the filtering in update_task_list, for a single task
+        return self.store.matches(task, self.current_filter, self.current_search)
+    
+    def row_position(self, task):
+        # Binary search for where a task belongs in the displayed, sorted rows
+        sort = self.sort_var.get()
+        if sort not in SORT_KEYS:
+            return len(self.task_listbox.items)
+        return self.bisect_rows(sort, self.store.sorted_views.entry(sort, task["id"]), right=True)
+    
+    def bisect_rows(self, sort, target, right=False, skip=None):
+        # The rows are in sort entry order; skip is a task whose entry in the view is already
+        # out of date (it stands at target instead)
+        items = self.task_listbox.items
+        entry = self.store.sorted_views.entry
+        low, high = 0, len(items)
+        while low < high:
+            middle = (low + high) // 2
+            item = entry(sort, items[middle]) if items[middle] != skip else target
+            if target < item or (not right and target == item):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+    
+    def find_row(self, task_id, target=None):
+        # The row showing a task, or None; target is its entry when the view has already moved on
+        items = self.task_listbox.items
+        sort = self.sort_var.get()
+        if sort not in SORT_KEYS:
+            try:
+                return items.index(task_id)
+            except ValueError:
+                return None
+        if target is None:
+            target = self.store.sorted_views.entry(sort, task_id)
+        row = self.bisect_rows(sort, target, skip=task_id)
+        return row if row < len(items) and items[row] == task_id else None
+    
+    @timed("list patch")
+    def on_tasks_changed(self, event, task, old):
+        # Patch only the affected rows instead of rebuilding the whole list (TaskStats keeps the counts)
+        if task is not None:
+            self.display_cache.pop(task["id"], None)
+        if event in ("reset", "batch") or self.tasks.batching:
+            # Large batches are cheaper to rebuild once, and while loading
+            # the first screenful stays up until everything is in
+            self.schedule_refresh("stats" if self.loader is not None and event != "reset" else "full")
+            return
+        if self.current_filter in TaskStore.GRAPH_FILTERS and (event != "changed" or "completed" in old or "dependencies" in old):
+            # Finishing or re-linking a task can move its dependents in or out of the ready/blocked view
+            self.schedule_refresh("full")
+            return
         
-        # Filter tasks based on current filter and search term
-        filtered_tasks = self.tasks
-        if self.current_filter == "active":
-            filtered_tasks = [task for task in self.tasks if not task["completed"]]
-        elif self.current_filter == "completed":
-            filtered_tasks = [task for task in self.tasks if task["completed"]]
-        
-        # Apply search filter
-        if search_term:
-            filtered_tasks = [task for task in filtered_tasks if 
-                            search_term in task["task"].lower() or
-                            search_term in task["category"].lower() or
-                            any(search_term in tag.lower() for tag in task.get("tags", []))]
-        
-        # Sort tasks
-        if self.sort_var.get() == "priority":
-            priority_order = {"High": 0, "Medium": 1, "Low": 2}
-            filtered_tasks.sort(key=lambda x: (priority_order[x["priority"]], x["due_date"]))
-        elif self.sort_var.get() == "date":
-            filtered_tasks.sort(key=lambda x: (x["due_date"] if x["due_date"] != "No due date" else "9999-99-99"))
-        elif self.sort_var.get() == "category":
-            filtered_tasks.sort(key=lambda x: (x["category"], x["priority"]))
-        
-        for i, task in enumerate(filtered_tasks, 1):
-            # Create task display string
+        position = None
+        if event != "added":
+            # Found by the entry it was sorted by before this change
+            position = self.find_row(task["id"], self.store.sorted_views.old_entry(self.sort_var.get(), task, old))
+        if event == "changed" and position is not None and self.matches_view(task):
+            key = self.sort_key()
+            if key is None or key({**task, **old}) == key(task):
+                self.task_listbox.redraw_index(position)
+                self.schedule_refresh("stats")
+                return
+        if position is not None:
+            self.task_listbox.delete_item(position)
+        if event != "removed" and self.matches_view(task):
+            self.task_listbox.insert_item(self.row_position(task), task["id"])
+        self.schedule_refresh("stats")
+    
+    def schedule_refresh(self, kind):
+        if self.refresh_pending is None:
+            self.root.after_idle(self.flush_refresh)
+        if kind == "full" or self.refresh_pending is None:
+            self.refresh_pending = kind
+    
+    def flush_refresh(self):
+        kind, self.refresh_pending = self.refresh_pending, None
+        if kind == "full":
+            self.update_task_list()
+        self.update_stats()
+        self.update_undo_buttons()
+    
+    def render_task(self, index, task_id):
+        # Create task display string, formatting each task only once until it changes
+        task = self.tasks.get(task_id)
+        task_display = self.display_cache.get(task["id"])
+        if task_display is None:
             prefix = "✓ " if task["completed"] else "○ "
-            priority_emoji = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}[task["priority"]]
-            category_emoji = {"Work": "💼", "Personal": "👤", "Shopping": "🛒", "Health": "❤️", "Other": "📌"}[task["category"]]
+            priority_emoji = self.PRIORITY_EMOJI.get(task["priority"], "")
+            category_emoji = self.CATEGORY_EMOJI.get(task["category"], "📌")
             
-            task_display = f"{i}. {prefix}{priority_emoji} {category_emoji} {task['task']}"
+            task_display = f"{prefix}{priority_emoji} {category_emoji} {task['task']}"
             if task["due_date"] != "No due date":
                 task_display += f" 📅 {task['due_date']}"
             if task.get("tags"):
@@ -576,33 +1038,149 @@ class TodoApp:
                 task_display += f" 📝"
             if task.get("dependencies"):
                 task_display += f" 🔗"
-            
-            self.task_listbox.insert(tk.END, task_display)
-            
-            # Set color based on completion status
-            color = "#95a5a6" if task["completed"] else "#2c3e50"
-            if self.current_theme == "dark":
-                color = "#7f8c8d" if task["completed"] else "#ecf0f1"
-            self.task_listbox.itemconfig(tk.END, fg=color)
+            if task.get("recurrence"):
+                task_display += f" 🔁"
+            self.display_cache[task["id"]] = task_display
+        
+        # Set color based on completion status
+        color = "#95a5a6" if task["completed"] else "#2c3e50"
+        if self.current_theme == "dark":
+            color = "#7f8c8d" if task["completed"] else "#ecf0f1"
+        return f"{index + 1}. {task_display}", color
+    
+    def poll_autosave(self):
+        # Errors happen on the autosave thread, so report them from here
+        error = self.store.autosave.last_error
+        if error is not None and error is not self.autosave_error:
+            messagebox.showerror("Error", f"Error saving tasks: {str(error)}")
+        self.autosave_error = error
+        self.root.after(self.AUTOSAVE_POLL_MS, self.poll_autosave)
+    
+    def toggle_perf(self):
+        # Timing is only switched on while the panel is visible, so it costs nothing otherwise
+        enabled = not monitor.enabled
+        monitor.set_enabled(enabled, self.root)
+        if enabled:
+            self.perf_frame.grid()
+            self.refresh_perf()
+        else:
+            self.perf_frame.grid_remove()
+    
+    def refresh_perf(self):
+        if not monitor.enabled:
+            return
+        self.perf_label.configure(text=monitor.format_report())
+        self.root.after(self.PERF_POLL_MS, self.refresh_perf)
+    
+    def dump_perf(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if file_path:
+            try:
+                monitor.dump(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Error saving timings: {str(e)}")
+    
+    def sync_now(self, manual=True):
+        if self.loader is not None:
+            if manual:
+                messagebox.showwarning("Warning", "Please wait until the tasks have finished loading!")
+            return
+        if self.sync is None:
+            url = simpledialog.askstring("Sync", "Address of the sync server:", initialvalue=DEFAULT_URL, parent=self.root)
+            if not url:
+                return
+            self.sync = SyncClient(self.store, url.strip())
+        # The transfer runs on a worker thread; what it pulls is merged here a page at a time
+        if self.sync.start():
+            self.sync_button.configure(text="🔄 Syncing...")
+            client = self.sync
+            self.root.after(self.IMPORT_POLL_MS, lambda: self.poll_sync(client, manual))
+    
+    def poll_sync(self, client, manual):
+        if client is not self.sync:
+            return  # Switched to another list
+        result = client.poll()
+        if result is None:
+            self.root.after(self.IMPORT_POLL_MS, lambda: self.poll_sync(client, manual))
+            return
+        if result[0] == "error":
+            self.sync_button.configure(text="🔄 Sync (offline)")
+            if manual:
+                messagebox.showerror("Error", f"Error syncing tasks: {result[1]}")
+        else:
+            self.sync_button.configure(text="🔄 Sync")
+        if self.sync_after_id is not None:
+            self.root.after_cancel(self.sync_after_id)
+        self.sync_after_id = self.root.after(self.SYNC_INTERVAL_MS, lambda: self.auto_sync(client))
+    
+    def auto_sync(self, client):
+        self.sync_after_id = None
+        if client is self.sync:
+            self.sync_now(manual=False)
+    
+    def resume_sync(self):
+        # A list that has been synced before keeps tracking its changes and syncs in the background
+        if SyncClient.configured(self.store):
+            self.sync = SyncClient(self.store)
+            self.sync_now(manual=False)
     
-    def save_tasks(self):
-        with open("tasks.json", "w") as f:
-            json.dump(self.tasks, f)
+    def stop_sync(self):
+        if self.sync is not None:
+            self.sync.close()
+            self.sync = None
+            self.sync_button.configure(text="🔄 Sync")
+    
+    def on_close(self):
+        self.stop_sync()
+        if self.loader is not None:
+            # Pending changes can only be saved on top of the complete list
+            loader, self.loader = self.loader, None
+            try:
+                self.store.load_all(loader)
+            except ValueError:
+                pass
+        if self.workspace is not None:
+            self.workspace.add(self.list_name, self.store)
+            self.workspace.close()
+        else:
+            self.store.close()
+        self.root.destroy()
     
     def load_tasks(self):
-        try:
-            if os.path.exists("tasks.json"):
-                with open("tasks.json", "r") as f:
-                    self.tasks = json.load(f)
-                self.update_task_list()
-                self.update_stats()
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading tasks: {str(e)}")
+        # Parse on a worker thread so the window shows at once; the first batch is just a screenful
+        self.display_cache.clear()
+        self.loader = self.store.loader()
+        self.loader.start()
+        self.root.after(self.LOAD_POLL_MS, self.poll_load)
     
-    def __del__(self):
-        self.stop_reminder_thread = True
-        if self.reminder_thread:
-            self.reminder_thread.join(timeout=1.0)
+    @timed("load_tasks")
+    def poll_load(self):
+        if self.loader is None:
+            return  # Finished by on_close
+        try:
+            message = self.loader.queue.get_nowait()
+        except queue.Empty:
+            self.root.after(self.LOAD_POLL_MS, self.poll_load)
+            return
+        
+        if message[0] == "batch":
+            # Indexes and stats follow each batch; the list itself is rebuilt once at the end
+            self.store.add_loaded(message[1])
+            self.root.after(self.LOAD_POLL_MS, self.poll_load)
+            return
+        
+        self.loader = None
+        if message[0] == "error":
+            messagebox.showerror("Error", f"Error loading tasks: {message[1]}")
+        self.store.finish_loading()
+        self.schedule_refresh("full")
+        self.store.start()
+        if self.workspace is not None:
+            self.workspace.add(self.list_name, self.store)
+        self.resume_sync()
     
     def toggle_theme(self):
         """Toggle between light and dark themes"""
@@ -649,5 +1227,8 @@ class TodoApp:
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = TodoApp(root)
+    # A task file opens, exactly as given, as the active list of the workspace in its directory
+    path = sys.argv[1] if len(sys.argv) > 1 else "tasks.json"
+    directory, filename = os.path.split(os.path.abspath(path))
+    app = TodoApp(root, workspace=Workspace(directory), list_name=filename)
     root.mainloop() 
\ No newline at end of file
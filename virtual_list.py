@@ -0,0 +1,199 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+
+class VirtualListbox(tk.Listbox):
+    """A Listbox that only draws the rows currently in view.
+
+    The full list lives in ``items``; ``render(index, item)`` turns one of
+    them into ``(text, color)`` and is only called for the visible rows
+    plus ``overscan`` rows on either side.  Scrolling goes through the
+    usual yview/yscrollcommand protocol, so a ttk.Scrollbar can drive it
+    exactly like a plain Listbox.  ``curselection`` returns indices into
+    ``items`` rather than into the drawn rows.  With selectmode "extended"
+    the selection survives scrolling: rows picked with Ctrl/Shift-click
+    stay selected when they leave the screen, and Ctrl+A selects every item.
+    """
+
+    def __init__(self, master=None, overscan=10, **kwargs):
+        self._yscrollcommand = kwargs.pop("yscrollcommand", None)
+        super().__init__(master, **kwargs)
+        self.overscan = overscan
+        self.items = []
+        self.render = lambda index, item: (str(item), None)
+        self.top = 0
+        self._selection = set()
+        self._line_height = None
+        self._redraw_pending = False
+
+        self.bind("<Configure>", lambda e: self.redraw())
+        self.bind("<<ListboxSelect>>", self._on_select, add="+")
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.bind("<Up>", lambda e: self._move_selection(-1))
+        self.bind("<Down>", lambda e: self._move_selection(1))
+        self.bind("<Prior>", lambda e: self._scroll_by(-self.visible_rows()))
+        self.bind("<Next>", lambda e: self._scroll_by(self.visible_rows()))
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<Control-Button-1>", lambda e: None)
+        self.bind("<Shift-Button-1>", lambda e: None)
+        self.bind("<Control-a>", self.select_all)
+
+    def configure(self, cnf=None, **kwargs):
+        # The scrollbar follows our virtual view, not the few rows Tk actually holds
+        if isinstance(cnf, dict):
+            kwargs = {**cnf, **kwargs}
+            cnf = None
+        if "yscrollcommand" in kwargs:
+            self._yscrollcommand = kwargs.pop("yscrollcommand")
+            self._update_scrollbar()
+        if cnf is None and not kwargs:
+            return super().configure()
+        return super().configure(cnf, **kwargs)
+
+    config = configure
+
+    def set_items(self, items, render=None):
+        """Replace the whole list; like delete(0, END) this clears the selection"""
+        self.items = items
+        if render is not None:
+            self.render = render
+        self._selection = set()
+        self.top = min(self.top, self._max_top())
+        self.redraw()
+
+    def insert_item(self, index, item):
+        """Insert one item; only the rows on screen are redrawn"""
+        self.items.insert(index, item)
+        self._selection = {i + 1 if i >= index else i for i in self._selection}
+        if index < self.top + self.visible_rows():
+            self.redraw_later()
+        else:
+            self._update_scrollbar()
+
+    def delete_item(self, index):
+        del self.items[index]
+        self._selection = {i - 1 if i > index else i for i in self._selection if i != index}
+        self.top = min(self.top, self._max_top())
+        if index < self.top + self.visible_rows():
+            self.redraw_later()
+        else:
+            self._update_scrollbar()
+
+    def select(self, index):
+        self._selection = {index}
+        self.see(index)
+        self.redraw()
+
+    def select_all(self, event=None):
+        self._selection = set(range(len(self.items)))
+        self.redraw()
+        self.event_generate("<<ListboxSelect>>")
+        return "break"
+
+    def redraw_later(self):
+        # Coalesce several insert/delete calls into a single redraw
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def visible_rows(self):
+        if self._line_height is None:
+            self._line_height = tkfont.Font(font=self.cget("font")).metrics("linespace") + 1
+        height = self.winfo_height()
+        if height <= 1:
+            # Not mapped yet, fall back to the configured height in lines
+            return int(self.cget("height"))
+        return max(1, height // self._line_height)
+
+    def _max_top(self):
+        return max(0, len(self.items) - self.visible_rows())
+
+    def redraw(self):
+        self._redraw_pending = False
+        rows = self.visible_rows()
+        end = min(len(self.items), self.top + rows)
+        super().delete(0, tk.END)
+        for index in range(max(0, self.top - self.overscan), min(len(self.items), end + self.overscan)):
+            text, color = self.render(index, self.items[index])
+            if self.top <= index < end:
+                super().insert(tk.END, text)
+                if color:
+                    self.itemconfig(tk.END, fg=color)
+                if index in self._selection:
+                    self.selection_set(index - self.top)
+        super().yview_moveto(0)
+        self._update_scrollbar()
+
+    def redraw_index(self, index):
+        """Redraw a single row if it is on screen"""
+        if self.top <= index < self.top + self.visible_rows() and index < len(self.items):
+            text, color = self.render(index, self.items[index])
+            row = index - self.top
+            super().delete(row)
+            super().insert(row, text)
+            if color:
+                self.itemconfig(row, fg=color)
+            if index in self._selection:
+                self.selection_set(row)
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand:
+            first, last = self.yview()
+            self._yscrollcommand(first, last)
+
+    def yview(self, *args):
+        if not args:
+            if not self.items:
+                return (0.0, 1.0)
+            count = len(self.items)
+            return (self.top / count, min(1.0, (self.top + self.visible_rows()) / count))
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * len(self.items)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows()
+            self._scroll_by(amount)
+
+    def _scroll_to(self, top):
+        top = max(0, min(top, self._max_top()))
+        if top != self.top:
+            self.top = top
+            self.redraw()
+        return "break"
+
+    def _scroll_by(self, amount):
+        return self._scroll_to(self.top + amount)
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def see(self, index):
+        if index < self.top:
+            self._scroll_to(index)
+        elif index >= self.top + self.visible_rows():
+            self._scroll_to(index - self.visible_rows() + 1)
+
+    def _on_click(self, event):
+        # A plain click starts a new selection, including the rows scrolled out of view
+        self._selection = set()
+
+    def _on_select(self, event=None):
+        # Tk only knows about the drawn rows; keep whatever is selected off screen
+        end = self.top + self.visible_rows()
+        hidden = {index for index in self._selection if not self.top <= index < end}
+        self._selection = hidden | {self.top + row for row in super().curselection()}
+
+    def _move_selection(self, step):
+        if not self.items:
+            return "break"
+        current = min(self._selection) if self._selection else self.top - step
+        index = max(0, min(len(self.items) - 1, current + step))
+        self.select(index)
+        self.event_generate("<<ListboxSelect>>")
+        return "break"
+
+    def curselection(self):
+        return tuple(sorted(self._selection))
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from storage import atomic_write, open_storage
+from task_store import TaskStore
+
+LIST_SUFFIXES = (".json", ".db", ".sqlite", ".sqlite3")
+
+
+def _fingerprint(path):
+    # Size and mtime of a list's file and journal, to tell whether a stored summary is still current
+    parts = []
+    for part in (path, f"{path}.journal"):
+        try:
+            stat = os.stat(part)
+            parts.append([stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            parts.append(None)
+    return parts
+
+
+class Workspace:
+    """A directory of task lists, one store file per list, named by filename.
+
+    Lists are keyed by their filename with the suffix, so ``tasks.json``
+    and ``tasks.db`` (as left by a migration to SQLite) are two lists.
+
+    Lists that were used recently stay loaded in an LRU cache of
+    TaskStores, so switching back to one is instant; once their estimated
+    size passes ``memory_cap`` bytes the least recently used ones are
+    saved and dropped (never the active one).  The others are only known
+    by a summary of their counts, kept in ``.workspace.json`` and
+    recomputed in the background when a file has changed since.
+    """
+
+    INDEX = ".workspace.json"
+    TASK_BYTES = 2048  # Rough size of a loaded task with its search, sort, graph and stats entries
+
+    def __init__(self, directory=".", memory_cap=512 * 1024 * 1024, on_reminder=None):
+        self.directory = directory
+        self.memory_cap = memory_cap
+        self.on_reminder = on_reminder
+        self.cache = OrderedDict()  # filename -> TaskStore, least recently used first
+        self.active = None
+        self.summaries = self._read_index()
+        # The summary thread and the Tk thread both update summaries and write the index
+        self.lock = threading.Lock()
+        self.summary_thread = None
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_index(self):
+        with self.lock:
+            data = json.dumps(self.summaries, indent=1).encode("utf-8")
+            atomic_write(os.path.join(self.directory, self.INDEX), data, fsync=False)
+
+    def _set_summary(self, name, summary):
+        with self.lock:
+            self.summaries[name] = summary
+
+    def names(self):
+        names = set(self.cache)
+        for filename in os.listdir(self.directory):
+            if os.path.splitext(filename)[1].lower() in LIST_SUFFIXES and not filename.startswith("."):
+                names.add(filename)
+        return sorted(names)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def create(self, name):
+        """Make an empty list; a name without a list suffix gets .json.  Returns the list's filename"""
+        name = name.strip()
+        if not name or name.startswith(".") or os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError("Please enter a list name without slashes!")
+        if os.path.splitext(name)[1].lower() not in LIST_SUFFIXES:
+            name += ".json"
+        if name in self.names():
+            raise ValueError(f"There is already a list called {name}!")
+        storage = open_storage(self.path(name))
+        storage.save([])
+        storage.close()
+        return name
+
+    # The loaded lists
+
+    def new_store(self, name):
+        """An unloaded TaskStore for a list; load it, then add() it"""
+        return TaskStore(open_storage(self.path(name)), on_reminder=self.on_reminder)
+
+    def get(self, name):
+        """The loaded store of a list, or None; counts as a use"""
+        store = self.cache.get(name)
+        if store is not None:
+            self.cache.move_to_end(name)
+        return store
+
+    def add(self, name, store):
+        self.cache[name] = store
+        self.cache.move_to_end(name)
+        self.evict()
+
+    def activate(self, name):
+        self.active = name
+        if name in self.cache:
+            self.cache.move_to_end(name)
+        self.evict()
+
+    def open(self, name):
+        """The list's store, loaded and started, as the active list (blocking)"""
+        store = self.get(name)
+        if store is None:
+            store = self.new_store(name)
+            store.load()
+            store.start()
+            self.add(name, store)
+        self.activate(name)
+        return store
+
+    def memory_estimate(self):
+        return sum(len(store.tasks) for store in self.cache.values()) * self.TASK_BYTES
+
+    def evict(self):
+        # Drop least recently used lists until the rest fit; a list that is still loading can't be saved yet
+        for name in list(self.cache):
+            if self.memory_estimate() <= self.memory_cap:
+                break
+            store = self.cache[name]
+            if name == self.active or store.loading:
+                continue
+            del self.cache[name]
+            store.close()
+            self._set_summary(name, self._summary_of(name, store))
+        self.save_index()
+
+    def close(self):
+        for name, store in self.cache.items():
+            if not store.loading:
+                store.close()
+                self._set_summary(name, self._summary_of(name, store))
+        self.cache.clear()
+        self.save_index()
+
+    # Summaries
+
+    def _summary_of(self, name, store):
+        stats = store.stats
+        return {"total": stats.total, "active": stats.active, "completed": stats.completed,
+                "overdue": stats.overdue(), "fingerprint": _fingerprint(self.path(name))}
+
+    def summary(self, name):
+        """Counts for a list: live if it is loaded, otherwise from the index (None if out of date)"""
+        store = self.cache.get(name)
+        if store is not None:
+            summary = self._summary_of(name, store)
+            del summary["fingerprint"]
+            return summary
+        with self.lock:
+            summary = self.summaries.get(name)
+        if summary is None or summary.get("fingerprint") != _fingerprint(self.path(name)):
+            return None
+        return summary
+
+    def refresh_summaries(self):
+        """Recount the lists whose summary is out of date, on a background thread"""
+        if self.summary_thread is not None and self.summary_thread.is_alive():
+            return
+        stale = [name for name in self.names() if self.summary(name) is None]
+        if stale:
+            self.summary_thread = threading.Thread(target=self._summarize, args=(stale,))
+            self.summary_thread.daemon = True
+            self.summary_thread.start()
+
+    def _summarize(self, names):
+        today = date.today().isoformat()
+        for name in names:
+            path = self.path(name)
+            fingerprint = _fingerprint(path)
+            storage = open_storage(path)
+            total = completed = overdue = 0
+            try:
+                # Streamed, so counting a large list doesn't load it
+                batches = storage.load_batches() if hasattr(storage, "load_batches") else [storage.load()]
+                for batch in batches:
+                    for task in batch:
+                        total += 1
+                        if task.get("completed"):
+                            completed += 1
+                        elif "0" <= str(task.get("due_date", ""))[:1] <= "9" and task["due_date"] < today:
+                            overdue += 1
+            except (OSError, ValueError):
+                continue
+            finally:
+                storage.close()
+            self._set_summary(name, {"total": total, "active": total - completed, "completed": completed,
+                                     "overdue": overdue, "fingerprint": fingerprint})
+        try:
+            self.save_index()
+        except OSError:
+            pass